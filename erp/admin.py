@@ -1,6 +1,11 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html
 
+from erp.enrollment import InvalidFile, enroll_students, read_csv
 from erp.models import Category, Course, Student, Group, Teacher, Homework, Module, Video
 
 
@@ -12,9 +17,46 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("name",)}
 
 
+class StudentImportForm(forms.Form):
+    file = forms.FileField(help_text='Columns: first_name, last_name, gender, phone_number, password, group')
+
+
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ('last_name', 'first_name', 'student_code', 'group')
+    change_list_template = 'admin/erp/student/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('import-csv/', self.admin_site.admin_view(self.import_csv), name='erp_student_import_csv'),
+        ]
+        return urls + super().get_urls()
+
+    def import_csv(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:erp_student_changelist')
+
+        form = StudentImportForm(request.POST or None, request.FILES or None)
+        errors = {}
+        if form.is_valid():
+            try:
+                rows = read_csv(form.cleaned_data['file'])
+            except InvalidFile as exc:
+                form.add_error('file', str(exc))
+            else:
+                students, errors = enroll_students(rows)
+                if not errors:
+                    self.message_user(request, f'Enrolled {len(students)} students.', messages.SUCCESS)
+                    return redirect('admin:erp_student_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import students from CSV',
+            'form': form,
+            'errors': errors,
+        }
+        return TemplateResponse(request, 'admin/erp/student/import_csv.html', context)
 
 
 @admin.register(Course)
@@ -0,0 +1,265 @@
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import DatabaseError, InterfaceError, connections
+
+from .circuit_breaker import DatabaseUnavailable, database_breaker
+
+logger = logging.getLogger(__name__)
+
+TAG_VERSION_KEY = 'erp:tag:{}'
+
+EARLY_REFRESH_BETA = 1.0
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2
+LOCK_POLL_INTERVAL = 0.05
+STALE_GRACE = 300
+LATENCY_BUDGET = 1.0
+
+
+class CacheEntry(namedtuple('CacheEntry', ['value', 'expires_at', 'compute_time', 'invalidated'])):
+    @property
+    def expired(self):
+        return time.time() >= self.expires_at
+
+    @property
+    def stale(self):
+        return self.invalidated or self.expired
+
+
+# CategorySerializer nests courses and CourseModelSerializer shows category.name,
+# so a write to one of these models stales the other model's lists as well.
+DEPENDENT_NAMESPACES = {
+    'category': ('course',),
+    'course': ('category',),
+}
+
+
+def get_namespace(model):
+    return model._meta.model_name
+
+
+def new_version():
+    # Random rather than a counter, so a tag version lost to eviction never
+    # comes back with a value that old entries were written under.
+    return uuid.uuid4().hex[:16]
+
+
+def get_tag_versions(tags):
+    keys = {TAG_VERSION_KEY.format(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    missing = keys.keys() - versions.keys()
+    if missing:
+        for key in missing:
+            cache.add(key, new_version(), timeout=None)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def set_tagged(key, value, tag_versions, timeout, compute_time=0, grace=0):
+    """
+    Store a value together with the versions its tags had when it was computed.
+    Read the versions with get_tag_versions() before computing the value, so a
+    write that lands in between still invalidates the entry. The entry is kept
+    for `grace` more seconds past its timeout as a stale copy.
+    """
+    cache.set(key, (value, tag_versions, time.time() + timeout, compute_time), timeout + grace)
+
+
+def get_shared_cache():
+    """
+    The cache shared by every worker: the L2 of a TwoTierCache, whose per-worker
+    copies would hide an entry another worker has just written.
+    """
+    return getattr(cache, 'l2', cache)
+
+
+def get_tagged_entry(key, tags=(), shared=False):
+    """
+    Read an entry and the current versions of its tags. Passing the tags the
+    entry is expected to carry fetches both in a single get_many round trip.
+    With shared=True both are read past the per-worker L1.
+    """
+    backend = get_shared_cache() if shared else cache
+    version_keys = {TAG_VERSION_KEY.format(tag) for tag in tags}
+    found = backend.get_many([key, *version_keys])
+    entry = found.get(key)
+    if entry is None:
+        return None
+
+    value, tag_versions, expires_at, compute_time = entry
+    unknown = {TAG_VERSION_KEY.format(tag) for tag in tag_versions} - version_keys
+    if unknown:
+        found.update(backend.get_many(unknown))
+    invalidated = any(
+        found.get(TAG_VERSION_KEY.format(tag)) != version
+        for tag, version in tag_versions.items()
+    )
+    return CacheEntry(value, expires_at, compute_time, invalidated)
+
+
+def get_tagged(key, default=None):
+    entry = get_tagged_entry(key)
+    return default if entry is None or entry.stale else entry.value
+
+
+def should_refresh(entry, beta=EARLY_REFRESH_BETA):
+    """
+    Probabilistic early refresh (XFetch): the closer the entry is to expiring and
+    the longer it took to compute, the likelier a reader is to recompute it now,
+    so entries are refreshed one at a time instead of all expiring together.
+    """
+    if entry.stale:
+        return True
+    return time.time() - entry.compute_time * beta * math.log(random.random() or 1e-12) >= entry.expires_at
+
+
+def acquire_lock(key, timeout=LOCK_TIMEOUT):
+    token = uuid.uuid4().hex
+    return token if cache.add(f'{key}:lock', token, timeout) else None
+
+
+def release_lock(key, token):
+    lock_key = f'{key}:lock'
+    if get_shared_cache().get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def wait_for_entry(key, tags=(), timeout=LOCK_WAIT):
+    # The lock holder's entry is only in the shared cache, L1 still has the old one.
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = get_tagged_entry(key, tags, shared=True)
+        if entry is not None and not entry.stale:
+            return entry
+    return None
+
+
+def compute_entry(key, compute, tags, timeout, grace=0, token=None):
+    try:
+        tag_versions = get_tag_versions(tags)
+        started = time.monotonic()
+        try:
+            value = compute()
+        except (DatabaseError, InterfaceError):
+            database_breaker.record_failure()
+            raise
+        compute_time = time.monotonic() - started
+        database_breaker.record_success()
+        set_tagged(key, value, tag_versions, timeout, compute_time, grace)
+        return CacheEntry(value, time.time() + timeout, compute_time, False)
+    finally:
+        if token is not None:
+            release_lock(key, token)
+
+
+def revalidate(key, compute, tags, timeout, grace, token, entry, latency_budget):
+    """
+    Recompute in a background thread, waiting at most latency_budget seconds for it.
+    When it is slower or fails, the current entry is returned instead and the
+    thread keeps going, so the cache is still refreshed once the database answers.
+    """
+    done = threading.Event()
+    result = []
+    errors = []
+
+    def run():
+        try:
+            result.append(compute_entry(key, compute, tags, timeout, grace, token))
+        except (DatabaseError, InterfaceError):
+            logger.warning('Cache revalidation of %s failed, serving the stale copy', key, exc_info=True)
+        except Exception as exc:
+            # Not a database problem (e.g. Http404 for a deleted row): the caller must see it.
+            errors.append(exc)
+        finally:
+            connections.close_all()
+            done.set()
+
+    threading.Thread(target=run, name='cache-revalidate', daemon=True).start()
+    if done.wait(latency_budget):
+        if errors:
+            raise errors[0]
+        return result[0] if result else entry
+
+    database_breaker.record_failure()
+    return entry
+
+
+def get_or_compute(key, compute, tags, timeout, grace=STALE_GRACE, latency_budget=LATENCY_BUDGET):
+    """
+    Single-flight read-through for a tagged entry, returning a CacheEntry.
+
+    Only the reader holding the lock recomputes. While it does, the others get
+    the previous value unless a write invalidated it, in which case they wait up
+    to LOCK_WAIT seconds for the fresh one. With a stale copy at hand, the
+    recompute runs under latency_budget (see revalidate), and while the
+    database circuit is open the stale copy is served without trying at all.
+    Check entry.stale to tell a stale copy apart.
+    """
+    entry = get_tagged_entry(key, tags)
+    if entry is not None and not should_refresh(entry):
+        return entry
+
+    if not database_breaker.allow():
+        if entry is None:
+            raise DatabaseUnavailable()
+        return entry
+
+    token = acquire_lock(key)
+    if token is None:
+        if entry is not None and not entry.invalidated:
+            return entry
+        fresh = wait_for_entry(key, tags)
+        if fresh is not None:
+            return fresh
+        if entry is not None:
+            return entry
+
+    if entry is None or latency_budget is None:
+        return compute_entry(key, compute, tags, timeout, grace, token)
+    return revalidate(key, compute, tags, timeout, grace, token, entry, latency_budget)
+
+
+def invalidate_tags(*tags):
+    """
+    Invalidate every entry carrying one of the tags by replacing the tag version,
+    all tags in one set_many. Stale entries are never served again and expire
+    by their own timeout.
+    """
+    cache.set_many({TAG_VERSION_KEY.format(tag): new_version() for tag in set(tags)}, timeout=None)
+
+
+def get_cascaded_models(model, seen=None):
+    # Deleting a row cascades to (or nulls out) the rows of every model pointing at it.
+    seen = set() if seen is None else seen
+    for relation in model._meta.related_objects:
+        related_model = relation.related_model
+        if related_model._meta.app_label == model._meta.app_label and related_model not in seen:
+            seen.add(related_model)
+            get_cascaded_models(related_model, seen)
+    return seen
+
+
+def get_affected_namespaces(*models, cascade=False):
+    if cascade:
+        models = set(models)
+        for model in list(models):
+            models.update(get_cascaded_models(model))
+
+    namespaces = set()
+    for model in models:
+        namespace = get_namespace(model)
+        namespaces.add(namespace)
+        namespaces.update(DEPENDENT_NAMESPACES.get(namespace, ()))
+    return namespaces
+
+
+def invalidate(*models, cascade=False):
+    invalidate_tags(*get_affected_namespaces(*models, cascade=cascade))
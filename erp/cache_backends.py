@@ -0,0 +1,324 @@
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django_redis.compressors.zlib import ZlibCompressor
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+GENERATION_KEY = 'erp:l1:generation'
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class ThresholdZlibCompressor(ZlibCompressor):
+    """
+    Only compresses payloads of at least OPTIONS['COMPRESS_MIN_LENGTH'] bytes:
+    small values (tag versions, locks, short lists) are cheaper to send as is.
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.min_length = options.get('COMPRESS_MIN_LENGTH', 1024)
+
+
+class LocalStore:
+    """
+    The in-process LRU shared by every thread of a worker, plus its stats and
+    the Redis subscription that evicts keys written by other workers.
+    """
+
+    def __init__(self, max_entries, redis_url=None, channel=None):
+        self.max_entries = max_entries
+        self.redis_url = redis_url
+        self.channel = channel
+        self.node_id = uuid.uuid4().hex
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0}
+        self.generation = None
+        self.last_poll = 0
+        self.redis = None
+        self.subscribed = False
+        self.pid = os.getpid()
+        if redis_url:
+            self.subscribe()
+
+    def subscribe(self):
+        try:
+            import redis
+            self.redis = redis.Redis.from_url(self.redis_url)
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self.channel)
+        except Exception:
+            logger.warning('L1 cache: Redis pub/sub unavailable, polling %s instead', GENERATION_KEY, exc_info=True)
+            self.redis = None
+            return
+
+        self.subscribed = True
+        thread = threading.Thread(target=self.listen, args=(pubsub,), name='l1-cache-invalidation', daemon=True)
+        thread.start()
+
+    def listen(self, pubsub):
+        try:
+            for message in pubsub.listen():
+                sender, _, key = message['data'].decode().partition(' ')
+                if sender != self.node_id:
+                    self.forget(key)
+        except Exception:
+            logger.warning('L1 cache: lost Redis subscription, polling %s instead', GENERATION_KEY, exc_info=True)
+        finally:
+            # Messages may have been missed, so start over from an empty L1.
+            self.subscribed = False
+            self.forget('*')
+
+    def publish(self, keys):
+        if self.redis is None:
+            return
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for key in keys:
+                pipeline.publish(self.channel, f'{self.node_id} {key}')
+            pipeline.execute()
+        except Exception:
+            logger.warning('L1 cache: could not publish invalidation', exc_info=True)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, pickled = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            self.forget(key)
+            return
+
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, pickled)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def forget(self, key):
+        with self.lock:
+            if key == '*':
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+
+class TwoTierCache(BaseCache):
+    """
+    Per-worker in-process LRU (L1) in front of another cache alias (L2).
+
+    LOCATION names the L2 alias, TIMEOUT caps how long a value lives in L1 and
+    MAX_ENTRIES bounds its size. Every write goes through to L2, but only
+    invalidations are announced to the other workers so they drop their L1
+    copy: writes and deletes of keys starting with one of
+    OPTIONS['ANNOUNCE_PREFIXES'], by default the tag versions through which
+    erp.cache invalidates entries, and clear(). Locks, circuit breaker state
+    and cached values changed elsewhere are picked up once the local copy
+    times out. Announcements go over Redis pub/sub when OPTIONS['REDIS_URL']
+    is set, otherwise through a generation key in L2 that each worker polls
+    every OPTIONS['POLL_INTERVAL'] seconds.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = server
+        self._redis_url = options.get('REDIS_URL')
+        self._channel = options.get('CHANNEL', 'erp:l1:invalidate')
+        self._poll_interval = options.get('POLL_INTERVAL', 1)
+        self._announce_prefixes = tuple(options.get('ANNOUNCE_PREFIXES', ('erp:tag:',)))
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    @property
+    def store(self):
+        # Django creates one backend instance per thread; the L1 is per process.
+        store_key = (self._l2_alias, self._channel)
+        store = _stores.get(store_key)
+        if store is None or store.pid != os.getpid():
+            with _stores_lock:
+                store = _stores.get(store_key)
+                if store is None or store.pid != os.getpid():
+                    # Also covers a fork: the parent's entries and subscriber are not ours.
+                    store = _stores[store_key] = LocalStore(self._max_entries, self._redis_url, self._channel)
+        return store
+
+    def _sync(self):
+        store = self.store
+        if store.subscribed:
+            return store
+
+        now = time.monotonic()
+        if now - store.last_poll >= self._poll_interval:
+            store.last_poll = now
+            generation = self.l2.get(GENERATION_KEY)
+            if generation != store.generation:
+                store.forget('*')
+                store.generation = generation
+        return store
+
+    def _announced(self, key):
+        return key.startswith(self._announce_prefixes)
+
+    def _announce(self, *keys):
+        if not keys:
+            return
+        store = self.store
+        # The generation key is bumped even with pub/sub, so workers that fell
+        # back to polling still notice writes made by the others.
+        try:
+            generation = self.l2.incr(GENERATION_KEY)
+        except ValueError:
+            self.l2.add(GENERATION_KEY, 1, timeout=None)
+            generation = None
+        if store.generation is not None and generation == store.generation + 1:
+            store.generation = generation
+        store.publish(keys)
+
+    def _ttl(self, timeout=DEFAULT_TIMEOUT):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.default_timeout
+        return min(timeout, self.default_timeout)
+
+    def get(self, key, default=None, version=None):
+        store = self._sync()
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = store.get(l1_key)
+        if value is not MISSING:
+            store.count('l1_hits')
+            return value
+
+        value = self.l2.get(key, MISSING, version=version)
+        if value is MISSING:
+            store.count('misses')
+            return default
+        store.count('l2_hits')
+        store.set(l1_key, value, self._ttl())
+        return value
+
+    def get_many(self, keys, version=None):
+        store = self._sync()
+        found = {}
+        remaining = []
+        for key in keys:
+            value = store.get(self.make_and_validate_key(key, version=version))
+            if value is MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+        store.count('l1_hits', len(found))
+
+        if remaining:
+            fetched = self.l2.get_many(remaining, version=version)
+            for key, value in fetched.items():
+                store.set(self.make_and_validate_key(key, version=version), value, self._ttl())
+            store.count('l2_hits', len(fetched))
+            store.count('misses', len(remaining) - len(fetched))
+            found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version=version) is not MISSING
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self.store.set(l1_key, value, self._ttl(timeout))
+        if self._announced(key):
+            self._announce(l1_key)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        # django-redis returns None instead of the list of failed keys
+        failed = self.l2.set_many(data, timeout=timeout, version=version) or []
+        announced = []
+        for key, value in data.items():
+            l1_key = self.make_and_validate_key(key, version=version)
+            if self._announced(key):
+                announced.append(l1_key)
+            if key in failed:
+                self.store.forget(l1_key)
+            else:
+                self.store.set(l1_key, value, self._ttl(timeout))
+        self._announce(*announced)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self.store.set(l1_key, value, self._ttl(timeout))
+            if self._announced(key):
+                self._announce(l1_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.store.forget(self.make_and_validate_key(key, version=version))
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        deleted = self.l2.delete(key, version=version)
+        self.store.forget(l1_key)
+        if self._announced(key):
+            self._announce(l1_key)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        l1_keys = {key: self.make_and_validate_key(key, version=version) for key in keys}
+        self.l2.delete_many(keys, version=version)
+        for l1_key in l1_keys.values():
+            self.store.forget(l1_key)
+        self._announce(*(l1_key for key, l1_key in l1_keys.items() if self._announced(key)))
+
+    def incr(self, key, delta=1, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self.l2.incr(key, delta, version=version)
+        self.store.forget(l1_key)
+        if self._announced(key):
+            self._announce(l1_key)
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def clear(self):
+        self.l2.clear()
+        self.store.forget('*')
+        self._announce('*')
+
+    def stats(self):
+        store = self.store
+        with store.lock:
+            stats = dict(store.stats, l1_size=len(store.entries))
+        lookups = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+        stats['l1_hit_ratio'] = stats['l1_hits'] / lookups if lookups else 0
+        stats['l2_hit_ratio'] = stats['l2_hits'] / lookups if lookups else 0
+        stats['invalidation'] = 'pubsub' if store.subscribed else 'poll'
+        stats['pid'] = store.pid
+        return stats
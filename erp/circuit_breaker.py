@@ -0,0 +1,44 @@
+from django.core.cache import cache
+from rest_framework.exceptions import APIException
+
+
+class DatabaseUnavailable(APIException):
+    status_code = 503
+    default_detail = 'The database is temporarily unavailable, try again shortly.'
+    default_code = 'database_unavailable'
+
+
+class CircuitBreaker:
+    """
+    Shared across workers through the cache: after failure_threshold failures
+    within failure_window seconds the circuit opens for reset_timeout seconds.
+    Once it closes again, a single further failure reopens it right away until
+    the failure window has passed.
+    """
+
+    def __init__(self, name, failure_threshold=5, failure_window=60, reset_timeout=30):
+        self.failures_key = f'erp:circuit:{name}:failures'
+        self.open_key = f'erp:circuit:{name}:open'
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.reset_timeout = reset_timeout
+
+    def allow(self):
+        return cache.get(self.open_key) is None
+
+    def record_success(self):
+        cache.delete(self.failures_key)
+
+    def record_failure(self):
+        if cache.add(self.failures_key, 1, self.failure_window):
+            failures = 1
+        else:
+            try:
+                failures = cache.incr(self.failures_key)
+            except ValueError:
+                failures = 1
+        if failures >= self.failure_threshold:
+            cache.set(self.open_key, True, self.reset_timeout)
+
+
+database_breaker = CircuitBreaker('database')
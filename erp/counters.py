@@ -0,0 +1,42 @@
+from django.db.models import F
+
+from .models import Category, Course, Group, Homework, Module, ObjectCount, Student, Teacher, Video
+
+COUNTED_MODELS = (Category, Course, Teacher, Group, Module, Homework, Video, Student)
+
+
+def get_label(model):
+    return model._meta.label_lower
+
+
+def adjust_count(model, delta):
+    """
+    Add delta to the model's counter with a single UPDATE, so concurrent writers
+    never lose an increment. Runs in the caller's transaction when there is one.
+    A missing counter is created from a full count, which already includes the
+    row being saved or excludes the one being deleted.
+    """
+    label = get_label(model)
+    if not ObjectCount.objects.filter(model=label).update(count=F('count') + delta):
+        ObjectCount.objects.get_or_create(model=label, defaults={'count': model.objects.count()})
+
+
+def get_counts(models=COUNTED_MODELS):
+    """Counts of the given models from the counters table, in one query."""
+    counts = dict(
+        ObjectCount.objects.filter(model__in=[get_label(model) for model in models]).values_list('model', 'count')
+    )
+    missing = [model for model in models if get_label(model) not in counts]
+    for model in missing:
+        counts[get_label(model)] = reconcile_count(model)[1]
+    return {model: counts[get_label(model)] for model in models}
+
+
+def reconcile_count(model):
+    """Reset the model's counter to its real row count, returning (old, new)."""
+    actual = model.objects.count()
+    counter, created = ObjectCount.objects.get_or_create(model=get_label(model), defaults={'count': actual})
+    old = None if created else counter.count
+    if old != actual:
+        ObjectCount.objects.filter(pk=counter.pk).update(count=actual)
+    return old, actual
@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+STICKY_KEY = 'erp:db:sticky:{}'
+RECENT_WRITE_KEY = 'erp:db:recent-write'
+
+# Set by ReplicaRoutingMiddleware for the duration of a request; everything
+# else (management commands, shells, background threads) reads from the primary.
+_use_replicas = ContextVar('erp_use_replicas', default=False)
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def get_replica_lag(alias):
+    """Seconds the replica is behind its primary, 0 when it has replayed everything it received."""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor != 'postgresql':
+            cursor.execute('SELECT 1')
+            return 0.0
+        cursor.execute(
+            'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+            'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+        )
+        return float(cursor.fetchone()[0])
+
+
+def is_healthy(alias):
+    """
+    Whether the replica answers and lags at most REPLICA_MAX_LAG seconds. The
+    answer is kept for REPLICA_CHECK_INTERVAL seconds, per process.
+    """
+    now = time.monotonic()
+    checked_at, healthy = _health.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < settings.REPLICA_CHECK_INTERVAL:
+        return healthy
+
+    with _health_lock:
+        checked_at, healthy = _health.get(alias, (None, False))
+        if checked_at is not None and now - checked_at < settings.REPLICA_CHECK_INTERVAL:
+            return healthy
+        try:
+            lag = get_replica_lag(alias)
+        except DatabaseError:
+            logger.warning('Replica %s is unreachable, reading from the primary', alias, exc_info=True)
+            healthy = False
+        else:
+            healthy = lag <= settings.REPLICA_MAX_LAG
+            if not healthy:
+                logger.warning('Replica %s lags %.1fs behind, reading from the primary', alias, lag)
+        _health[alias] = (time.monotonic(), healthy)
+    return healthy
+
+
+def get_healthy_replicas():
+    return [alias for alias in get_replicas() if is_healthy(alias)]
+
+
+def record_write():
+    """Note that the replicas may not have replayed everything for the next REPLICA_MAX_LAG seconds."""
+    if get_replicas():
+        cache.set(RECENT_WRITE_KEY, True, settings.REPLICA_MAX_LAG)
+
+
+def limit_to_replica_lag(timeout):
+    """
+    The timeout for a cache entry filled from the reads in progress: cut down
+    to REPLICA_MAX_LAG when they go to a replica and a write landed within
+    that time, so an entry read before the replica replayed it, but stored
+    under the tag versions the write left, is not kept for longer than that.
+    """
+    if _use_replicas.get() and get_healthy_replicas() and cache.get(RECENT_WRITE_KEY):
+        return min(timeout, settings.REPLICA_MAX_LAG)
+    return timeout
+
+
+def get_client_key(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if authorization:
+        # JWT and Basic auth are only resolved inside the DRF view.
+        return f'auth:{hashlib.md5(authorization.encode()).hexdigest()}'
+    return f'ip:{request.META.get("REMOTE_ADDR")}'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets GET/HEAD/OPTIONS requests read erp models from the replicas, except
+    for clients that wrote within the last REPLICA_STICKY_SECONDS: those keep
+    reading from the primary so they see their own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_replicas():
+            return self.get_response(request)
+
+        sticky_key = STICKY_KEY.format(get_client_key(request))
+        safe = request.method in ('GET', 'HEAD', 'OPTIONS')
+        token = _use_replicas.set(safe and not cache.get(sticky_key))
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replicas.reset(token)
+
+        if not safe:
+            cache.set(sticky_key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'erp' or not _use_replicas.get():
+            return None
+        replicas = get_healthy_replicas()
+        return random.choice(replicas) if replicas else None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication.
+        return False if db in get_replicas() else None
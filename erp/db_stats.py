@@ -0,0 +1,48 @@
+import os
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+_opened = {}
+_opened_lock = threading.Lock()
+
+
+def count_connection(alias):
+    with _opened_lock:
+        _opened[alias] = _opened.get(alias, 0) + 1
+
+
+def get_pool_stats(pool):
+    stats = pool.get_stats()
+    requests = stats.get('requests_num', 0)
+    return {
+        'size': stats.get('pool_size', 0),
+        'available': stats.get('pool_available', 0),
+        'min_size': pool.min_size,
+        'max_size': pool.max_size,
+        'requests': requests,
+        # Checkouts that found no free connection and had to wait, and those
+        # that gave up after the pool timeout (the pool was exhausted).
+        'waited': stats.get('requests_queued', 0),
+        'timed_out': stats.get('requests_errors', 0),
+        'waiting_now': stats.get('requests_waiting', 0),
+        'avg_wait_ms': stats.get('requests_wait_ms', 0) / requests if requests else 0,
+        'connections_opened': stats.get('connections_num', 0),
+        'connect_ms': stats.get('connections_ms', 0),
+    }
+
+
+def get_database_stats():
+    """Connection stats of this worker process, per database alias."""
+    stats = {'pid': os.getpid(), 'mode': settings.DB_CONNECTION_MODE, 'databases': {}}
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is not None:
+            stats['databases'][alias] = get_pool_stats(pool)
+        else:
+            stats['databases'][alias] = {
+                'conn_max_age': connections.settings[alias]['CONN_MAX_AGE'],
+                'connections_opened': _opened.get(alias, 0),
+            }
+    return stats
@@ -0,0 +1,70 @@
+import csv
+import io
+
+from django.db import transaction
+
+from .cache import invalidate, invalidate_tags
+from .counters import adjust_count
+from .models import Group, Student, reserve_student_codes
+from .serializers import StudentEnrollmentSerializer
+
+BATCH_SIZE = 1000
+
+
+class InvalidFile(Exception):
+    pass
+
+
+def read_csv(file):
+    """Rows of an uploaded CSV file with a header line, as dicts without the empty cells."""
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig'))
+    try:
+        return [{key: value for key, value in row.items() if value not in ('', None)} for row in reader]
+    except (UnicodeDecodeError, csv.Error):
+        raise InvalidFile('The file has to be a UTF-8 encoded CSV file')
+
+
+def validate_rows(rows):
+    """
+    Validate every row, returning (validated rows, errors). Groups are fetched
+    in a single query up front instead of one lookup per row. errors maps the
+    row number (from 1) to that row's serializer errors.
+    """
+    # Rows that are not objects are left to the serializer, which reports them.
+    rows_with_group = [row for row in rows if isinstance(row, dict)]
+    group_ids = {str(row.get('group')) for row in rows_with_group if str(row.get('group') or '').isdigit()}
+    context = {'groups': Group.objects.in_bulk([int(pk) for pk in group_ids])}
+
+    valid_rows, errors = [], {}
+    for number, row in enumerate(rows, start=1):
+        serializer = StudentEnrollmentSerializer(data=row, context=context)
+        if serializer.is_valid():
+            valid_rows.append(serializer.validated_data)
+        else:
+            errors[number] = serializer.errors
+    return valid_rows, errors
+
+
+def enroll_students(rows, batch_size=BATCH_SIZE):
+    """
+    Enroll all rows or none: returns (students, errors) and only inserts when
+    no row has errors. Codes are reserved in one go, the rows are inserted with
+    bulk_create in chunks of batch_size within one transaction, and the caches
+    are invalidated once at the end.
+    """
+    valid_rows, errors = validate_rows(rows)
+    if errors or not valid_rows:
+        return [], errors
+
+    with transaction.atomic():
+        # Reserved in the same transaction, so a failed insert gives the codes back.
+        students = [
+            Student(student_code=code, **data)
+            for data, code in zip(valid_rows, reserve_student_codes(len(valid_rows)))
+        ]
+        students = Student.objects.bulk_create(students, batch_size=batch_size)
+        # bulk_create sends no post_save, so the counter is bumped here.
+        adjust_count(Student, len(students))
+    invalidate(Student)
+    invalidate_tags(*{f'group:{student.group_id}' for student in students if student.group_id})
+    return students, {}
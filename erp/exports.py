@@ -0,0 +1,51 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest, QueryDict
+from rest_framework.request import Request
+
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    # csv.writer target that hands each formatted line back instead of buffering it.
+    def write(self, value):
+        return value
+
+
+def make_request(query_params):
+    request = HttpRequest()
+    request.GET = QueryDict(query_params)
+    return Request(request)
+
+
+def get_export_queryset(view_class, fields, request):
+    """The queryset the list endpoint of view_class would page through for this request."""
+    view = view_class(request=request, args=(), kwargs={}, format_kwarg=None)
+    queryset = view.filter_queryset(view.get_queryset())
+    if not queryset.ordered:
+        queryset = queryset.order_by('pk')
+    return queryset.values_list(*fields)
+
+
+def export_rows(queryset, fields, file_format, chunk_size=CHUNK_SIZE):
+    """
+    Yield the export line by line. Rows are read through a server-side cursor
+    in chunks of chunk_size, so memory stays flat however big the table is.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n'
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from erp.models import Video
+
+METADATA_FIELDS = ['size', 'checksum', 'mime_type', 'duration', 'width', 'height']
+
+
+class Command(BaseCommand):
+    help = (
+        'Read size, checksum, MIME type, duration and resolution of videos uploaded before they were '
+        'stored at upload time. Each file is streamed from storage once; missing files are reported and skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-read every video, not only those without a size.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, all, chunk_size, **options):
+        videos = Video.objects.exclude(file='').order_by('pk')
+        if not all:
+            videos = videos.filter(size__isnull=True)
+
+        updated = missing = 0
+        for video in videos.iterator(chunk_size=chunk_size):
+            try:
+                with video.file.open('rb'):
+                    video.set_metadata()
+            except OSError as exc:
+                missing += 1
+                self.stderr.write(f'Video {video.pk}: cannot read {video.file.name} ({exc})')
+                continue
+            video.save(update_fields=[*METADATA_FIELDS, 'updated_at'])
+            updated += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{updated} videos updated, {missing} missing'))
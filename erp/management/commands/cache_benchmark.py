@@ -0,0 +1,117 @@
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+KEY_PREFIX = 'cache-benchmark'
+
+
+def make_page(rows):
+    # Shaped like a rendered /api/students/ page, which is our most common list payload.
+    results = [
+        {
+            'id': pk,
+            'first_name': f'First{pk}',
+            'last_name': f'Last{pk}',
+            'gender': 'MALE',
+            'phone_number': f'+99890{pk:07d}',
+            'password': 'x' * 32,
+            'image': '/media/images/default.png',
+            'student_code': f'{10_000 + pk % 90_000}',
+            'group': pk % 40,
+        }
+        for pk in range(1, rows + 1)
+    ]
+    content = JSONRenderer().render({
+        'page': 1, 'pages_count': 1, 'next': None, 'previous': None, 'total': rows, 'results': results,
+    })
+    return (content, 'application/json', 'W/"0123456789abcdef"', int(time.time())), {'student': 'abcdef0123456789'}
+
+
+def timed(function, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+class Command(BaseCommand):
+    help = 'Compare the file and Redis cache backends on list payloads of different sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10, 100, 1000, 10000])
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--batch', type=int, default=10, help='Keys per get_many/set_many call.')
+        parser.add_argument(
+            '--redis-url', default='redis://127.0.0.1:6379/15',
+            help='Keys are written under their own prefix and only those are deleted afterwards.',
+        )
+        parser.add_argument(
+            '--allow-app-redis', action='store_true',
+            help='Run against settings.REDIS_URL, the Redis the application caches in.',
+        )
+
+    def get_backends(self, directory, redis_url):
+        backends = {'file': FileBasedCache(directory, {})}
+        try:
+            from django_redis.cache import RedisCache
+        except ImportError:
+            raise CommandError('django-redis is not installed')
+
+        options = {'CLIENT_CLASS': 'django_redis.client.DefaultClient'}
+        backends['redis'] = RedisCache(redis_url, {'KEY_PREFIX': KEY_PREFIX, 'OPTIONS': options})
+        backends['redis+zlib'] = RedisCache(redis_url, {'KEY_PREFIX': KEY_PREFIX, 'OPTIONS': {
+            **options,
+            'COMPRESSOR': 'erp.cache_backends.ThresholdZlibCompressor',
+            'COMPRESS_MIN_LENGTH': 1024,
+        }})
+        return backends
+
+    def handle(self, *args, **options):
+        redis_url = options['redis_url']
+        if settings.REDIS_URL and redis_url == settings.REDIS_URL and not options['allow_app_redis']:
+            raise CommandError(
+                f'{redis_url} is the application cache; pass --allow-app-redis to benchmark against it anyway'
+            )
+
+        directory = tempfile.mkdtemp(prefix='cache-benchmark-')
+        try:
+            backends = self.get_backends(directory, redis_url)
+            self.benchmark(backends, options['rows'], options['iterations'], options['batch'])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def benchmark(self, backends, rows_counts, iterations, batch):
+        self.stdout.write(
+            f'{"backend":<12}{"rows":>7}{"bytes":>10}{"set ms":>10}{"get ms":>10}'
+            f'{"set_many ms":>13}{"get_many ms":>13}'
+        )
+        for rows in rows_counts:
+            value = make_page(rows)
+            size = len(value[0][0])
+            keys = {f'benchmark:{rows}:{index}': value for index in range(batch)}
+            for name, backend in backends.items():
+                try:
+                    set_ms = timed(lambda: backend.set('benchmark', value, 60), iterations)
+                    get_ms = timed(lambda: backend.get('benchmark'), iterations)
+                    set_many_ms = timed(lambda: backend.set_many(keys, 60), max(iterations // batch, 1))
+                    get_many_ms = timed(lambda: backend.get_many(keys), max(iterations // batch, 1))
+                except Exception as exc:
+                    self.stderr.write(f'{name}: {exc}')
+                    continue
+                self.stdout.write(
+                    f'{name:<12}{rows:>7}{size:>10}{set_ms:>10.3f}{get_ms:>10.3f}'
+                    f'{set_many_ms:>13.3f}{get_many_ms:>13.3f}'
+                )
+            for backend in backends.values():
+                try:
+                    backend.delete_many(['benchmark', *keys])
+                except Exception:
+                    pass
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from erp.exports import CHUNK_SIZE, CONTENT_TYPES, export_rows, get_export_queryset, make_request
+from erp.views import ExportApiView
+
+
+class Command(BaseCommand):
+    help = 'Stream students, groups or homeworks as CSV or NDJSON, filtered like the list endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=sorted(ExportApiView.exports))
+        parser.add_argument('--format', dest='file_format', choices=sorted(CONTENT_TYPES), default='csv')
+        parser.add_argument('--output', help='File to write to (default: stdout).')
+        parser.add_argument(
+            '--query', default='',
+            help='Query string as accepted by the list endpoint, e.g. "search=ali&module_id=3".',
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, resource, file_format, output, query, chunk_size, **options):
+        view_class, fields = ExportApiView.exports[resource]
+        queryset = get_export_queryset(view_class, fields, make_request(query))
+        lines = export_rows(queryset, fields, file_format, chunk_size)
+
+        if output is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(output, 'w', newline='', encoding='utf-8') as file:
+            file.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(f'Wrote {resource} to {output}'))
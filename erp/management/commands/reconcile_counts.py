@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from erp.cache import invalidate
+from erp.counters import COUNTED_MODELS, get_label, reconcile_count
+
+
+class Command(BaseCommand):
+    help = 'Recount every counted model and fix counters that drifted (bulk writes, raw SQL, failed requests).'
+
+    def handle(self, *args, **options):
+        drifted = []
+        for model in COUNTED_MODELS:
+            old, actual = reconcile_count(model)
+            if old != actual:
+                drifted.append(model)
+                self.stdout.write(f'{get_label(model)}: {old} -> {actual}')
+
+        if drifted:
+            invalidate(*drifted)
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted)} of {len(COUNTED_MODELS)} counters fixed'))
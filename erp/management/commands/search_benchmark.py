@@ -0,0 +1,90 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework import filters
+from rest_framework.request import Request
+
+from erp.models import Student
+from erp.search import SearchFilter
+from erp.views import StudentApiView
+
+FIRST_NAMES = ['Ali', 'Aziz', 'Bekzod', 'Dilnoza', 'Jasur', 'Kamola', 'Laylo', 'Madina', 'Nodir', 'Sardor']
+LAST_NAMES = ['Aliyev', 'Karimov', 'Rahimova', 'Toshmatov', 'Valiyev', 'Yusupova', 'Xolmatov', 'Qodirov']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time student search with the indexed PostgreSQL backend against plain ILIKE scans. Seeds '
+        '--rows students inside a transaction that is rolled back, so nothing is kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--terms', nargs='+', default=['ali', 'valiyev', 'dilnoza rah', '90123', 'zzz'])
+
+    def handle(self, *args, rows, iterations, terms, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The search backend only differs from DRF on PostgreSQL')
+
+        try:
+            with transaction.atomic():
+                self.seed(rows)
+                self.stdout.write(f'{"term":<14} {"backend":<10} {"p50 ms":>8} {"p95 ms":>8} {"rows":>6}')
+                for term in terms:
+                    self.report(term, 'ilike', filters.SearchFilter(), iterations, seq_scan=True)
+                    self.report(term, 'indexed', SearchFilter(), iterations, seq_scan=False)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, rows):
+        with connection.cursor() as cursor:
+            # Five-digit student codes run out at 90,000 rows; the constraint
+            # only comes back with the rollback.
+            for name, constraint in connection.introspection.get_constraints(cursor, 'erp_student').items():
+                if constraint['unique'] and constraint['columns'] == ['student_code'] and not constraint['primary_key']:
+                    cursor.execute(f'ALTER TABLE erp_student DROP CONSTRAINT IF EXISTS {name}')
+                    cursor.execute(f'DROP INDEX IF EXISTS {name}')
+
+        Student.objects.bulk_create(
+            (
+                Student(
+                    first_name=FIRST_NAMES[i % len(FIRST_NAMES)],
+                    last_name=LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)],
+                    phone_number=f'+99890{i:07d}',
+                    password='',
+                    student_code=f'{10_000 + i % 90_000}',
+                )
+                for i in range(rows)
+            ),
+            batch_size=10_000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE erp_student')
+
+    def report(self, term, backend, search_filter, iterations, seq_scan):
+        view = StudentApiView()
+        request = Request(RequestFactory().get('/api/students/', {'search': term}))
+        queryset = search_filter.filter_queryset(request, Student.objects.all(), view)
+
+        with connection.cursor() as cursor:
+            # Force the baseline onto the plan it had before the trigram indexes existed.
+            cursor.execute(f'SET LOCAL enable_bitmapscan = {"off" if seq_scan else "on"}')
+            cursor.execute(f'SET LOCAL enable_indexscan = {"off" if seq_scan else "on"}')
+
+        samples, found = [], 0
+        for _ in range(iterations):
+            started = time.perf_counter()
+            found = len(list(queryset[:100].values_list('pk', flat=True)))
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        self.stdout.write(f'{term:<14} {backend:<10} {statistics.median(samples):>8.1f} {p95:>8.1f} {found:>6}')
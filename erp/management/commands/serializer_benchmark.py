@@ -0,0 +1,107 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from erp.models import Category, Course, Group, Student, Teacher, reserve_student_codes
+from erp.values import compile_values_serializer
+from erp.views import CourseApiView, GroupApiView, HomeworkApiView, ModuleApiView, StudentApiView, TeacherApiView
+
+ENDPOINTS = {
+    'students': StudentApiView,
+    'groups': GroupApiView,
+    'courses': CourseApiView,
+    'teachers': TeacherApiView,
+    'modules': ModuleApiView,
+    'homeworks': HomeworkApiView,
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the DRF serializers against the values() fast path for each list endpoint and check '
+        'that both render the same bytes. Seeds --rows students, groups and courses inside a '
+        'transaction that is rolled back, so nothing is kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[100, 1000])
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS), default=['students', 'groups', 'courses'])
+
+    def handle(self, *args, rows, page_sizes, iterations, endpoints, **options):
+        try:
+            with transaction.atomic():
+                self.seed(rows)
+                self.stdout.write(f'{"endpoint":<10} {"rows":>5} {"drf ms":>8} {"values ms":>10} {"speedup":>8}')
+                for name in endpoints:
+                    for page_size in page_sizes:
+                        self.report(name, ENDPOINTS[name], page_size, iterations)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, rows):
+        now = timezone.now()
+        category = Category.objects.create(name='Benchmark', slug='benchmark-serializers')
+        teacher = Teacher.objects.create(
+            first_name='Bench', last_name='Mark', phone_number='', password='', username='benchmark-serializers',
+        )
+        courses = Course.objects.bulk_create(
+            Course(name=f'Course {i}', description='Benchmark', price=100, category=category) for i in range(rows)
+        )
+        groups = Group.objects.bulk_create(
+            Group(name=f'Group {i}', course=course, teacher=teacher, started_at=now, ended_at=now)
+            for i, course in enumerate(courses)
+        )
+        Student.objects.bulk_create(
+            Student(
+                first_name='Bench', last_name=f'Mark {i}', phone_number='', password='',
+                student_code=code, group=group,
+            )
+            for i, (group, code) in enumerate(zip(groups, reserve_student_codes(rows)))
+        )
+
+    def report(self, name, view_class, page_size, iterations):
+        view = view_class()
+        view.request = Request(RequestFactory().get(f'/api/{name}/'))
+        view.format_kwarg = None
+        queryset = view.filter_queryset(view.get_queryset())[:page_size]
+        serializer_class = view.get_serializer_class()
+        context = view.get_serializer_context()
+
+        values_serializer = compile_values_serializer(serializer_class(context=context), queryset)
+        if values_serializer is None:
+            raise CommandError(f'{serializer_class.__name__} has no values() fast path')
+
+        def drf():
+            return serializer_class(list(queryset.all()), many=True, context=context).data
+
+        def values():
+            return values_serializer.serialize(queryset.values(*values_serializer.columns))
+
+        if JSONRenderer().render(drf()) != JSONRenderer().render(values()):
+            raise CommandError(f'{name}: the values() fast path renders different output')
+
+        drf_ms, values_ms = self.time(drf, iterations), self.time(values, iterations)
+        self.stdout.write(
+            f'{name:<10} {len(drf()):>5} {drf_ms:>8.2f} {values_ms:>10.2f} {drf_ms / values_ms:>7.1f}x'
+        )
+
+    def time(self, serialize, iterations):
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            serialize()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
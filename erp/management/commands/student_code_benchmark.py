@@ -0,0 +1,64 @@
+import random
+import time
+
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+from django.test.utils import CaptureQueriesContext
+
+from erp.models import STUDENT_CODE_MIN, STUDENT_CODE_SPACE, Sequence, Student, reserve_student_codes, student_code_at
+
+
+class Rollback(Exception):
+    pass
+
+
+def random_probe_code():
+    # The allocator this replaced: one EXISTS query per random guess.
+    while True:
+        code = str(random.randint(STUDENT_CODE_MIN, STUDENT_CODE_MIN + STUDENT_CODE_SPACE - 1))
+        if not Student.objects.filter(student_code=code).exists():
+            return code
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the random-probe student code generator with the sequence allocator at several '
+        'occupancy levels. Runs inside a transaction that is rolled back, so nothing is kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--occupancy', type=float, nargs='+', default=[0.1, 0.5, 0.9])
+        parser.add_argument('--codes', type=int, default=200, help='Codes to allocate per run.')
+
+    def handle(self, *args, occupancy, codes, **options):
+        self.stdout.write(f'{"occupancy":>9} {"method":<14} {"ms/code":>8} {"queries/code":>13}')
+        for level in occupancy:
+            try:
+                with transaction.atomic():
+                    self.fill(int(STUDENT_CODE_SPACE * level))
+                    self.report(level, 'random probe', lambda: [random_probe_code() for _ in range(codes)], codes)
+                    self.report(level, 'reserve 1', lambda: [reserve_student_codes(1) for _ in range(codes)], codes)
+                    self.report(level, f'reserve {codes}', lambda: reserve_student_codes(codes), codes)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def fill(self, taken):
+        Student.objects.all().delete()
+        Student.objects.bulk_create(
+            (
+                Student(first_name='Bench', last_name='Mark', phone_number='', password='', student_code=student_code_at(index))
+                for index in range(taken)
+            ),
+            batch_size=5000,
+        )
+        Sequence.objects.update_or_create(name='student_code', defaults={'value': taken})
+
+    def report(self, level, method, allocate, codes):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            allocate()
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{level:>9.0%} {method:<14} {elapsed / codes * 1000:>8.3f} {len(queries) / codes:>13.2f}'
+        )
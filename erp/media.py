@@ -0,0 +1,74 @@
+import hashlib
+import json
+import logging
+import mimetypes
+import shutil
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+PROBE_TIMEOUT = 30
+
+
+def get_local_path(file):
+    """A filesystem path for an upload or a stored file, None for remote storage and in-memory uploads."""
+    if hasattr(file, 'temporary_file_path'):
+        return file.temporary_file_path()
+    if not getattr(file, '_committed', True):
+        upload = file.file
+        return upload.temporary_file_path() if hasattr(upload, 'temporary_file_path') else None
+    try:
+        return file.path
+    except (AttributeError, NotImplementedError, ValueError):
+        return None
+
+
+def get_mime_type(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def probe_video(path):
+    """Duration (seconds) and resolution from ffprobe, or {} when ffprobe is missing or fails."""
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe is None or path is None:
+        return {}
+    try:
+        output = subprocess.run(
+            [
+                ffprobe, '-v', 'error', '-select_streams', 'v:0',
+                '-show_entries', 'stream=width,height:format=duration', '-of', 'json', path,
+            ],
+            capture_output=True, check=True, timeout=PROBE_TIMEOUT,
+        ).stdout
+        data = json.loads(output)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        logger.warning('Could not probe %s', path, exc_info=True)
+        return {}
+
+    stream = (data.get('streams') or [{}])[0]
+    duration = data.get('format', {}).get('duration')
+    return {
+        'duration': float(duration) if duration else None,
+        'width': stream.get('width'),
+        'height': stream.get('height'),
+    }
+
+
+def read_video_metadata(file):
+    """
+    Size, SHA-256 checksum and MIME type of a video file in one streaming pass
+    over its chunks, plus duration and resolution where ffprobe can read it.
+    Works on a fresh upload as well as on a file already in storage.
+    """
+    checksum, size = hashlib.sha256(), 0
+    for chunk in file.chunks():
+        checksum.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+
+    return {
+        'size': size,
+        'checksum': checksum.hexdigest(),
+        'mime_type': get_mime_type(file.name),
+        **probe_video(get_local_path(file)),
+    }
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+COUNTED_MODELS = ('category', 'course', 'teacher', 'group', 'module', 'homework', 'video', 'student')
+
+
+def populate_counts(apps, schema_editor):
+    ObjectCount = apps.get_model('erp', 'ObjectCount')
+    ObjectCount.objects.bulk_create(
+        ObjectCount(model=f'erp.{name}', count=apps.get_model('erp', name).objects.count())
+        for name in COUNTED_MODELS
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0011_category_updated_at_course_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObjectCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+def create_student_code_sequence(apps, schema_editor):
+    apps.get_model('erp', 'Sequence').objects.get_or_create(name='student_code')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0012_objectcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_student_code_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0013_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['category', 'name'], name='course_category_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['status'], name='group_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homework',
+            index=models.Index(fields=['module', 'deadline'], name='homework_module_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='module',
+            index=models.Index(fields=['group', 'date_passed'], name='module_group_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['last_name', 'first_name'], name='student_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['module', 'status', '-created_at'], name='video_module_status_idx'),
+        ),
+    ]
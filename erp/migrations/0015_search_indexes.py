@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# Same columns as erp.search.SEARCH_FIELDS, frozen for this migration.
+SEARCH_FIELDS = {
+    'erp_category': ['name'],
+    'erp_course': ['name'],
+    'erp_teacher': ['first_name', 'last_name', 'username', 'phone_number'],
+    'erp_student': ['first_name', 'last_name', 'phone_number', 'student_code'],
+}
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements():
+            schema_editor.execute(statement)
+    return run
+
+
+def create_search_indexes():
+    yield 'CREATE EXTENSION IF NOT EXISTS pg_trgm'
+    for table, fields in SEARCH_FIELDS.items():
+        document = " || ' ' || ".join(f"coalesce({field}, '')" for field in fields)
+        yield (
+            f'ALTER TABLE {table} ADD COLUMN search_vector tsvector '
+            f"GENERATED ALWAYS AS (to_tsvector('simple', {document})) STORED"
+        )
+        yield f'CREATE INDEX {table}_search_idx ON {table} USING gin (search_vector)'
+        for field in fields:
+            yield f'CREATE INDEX {table}_{field}_trgm_idx ON {table} USING gin (UPPER({field}) gin_trgm_ops)'
+
+
+def drop_search_indexes():
+    for table, fields in SEARCH_FIELDS.items():
+        for field in fields:
+            yield f'DROP INDEX IF EXISTS {table}_{field}_trgm_idx'
+        yield f'DROP INDEX IF EXISTS {table}_search_idx'
+        yield f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0014_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(create_search_indexes), run_on_postgresql(drop_search_indexes)),
+    ]
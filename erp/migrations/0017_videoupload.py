@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 17:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0016_video_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.BigIntegerField()),
+                ('offset', models.BigIntegerField(default=0)),
+                ('checksum', models.CharField(blank=True, help_text='Expected SHA-256, checked on completion', max_length=64)),
+                ('parts', models.JSONField(default=list, editable=False)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('assembling', 'Assembling')], default='uploading', editable=False, max_length=10)),
+                ('assembly_started_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('video', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='upload', to='erp.video')),
+            ],
+        ),
+    ]
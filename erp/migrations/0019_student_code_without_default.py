@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0018_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='student',
+            name='student_code',
+            field=models.CharField(editable=False, help_text='Avtomatik yaratilgan 5 xonali student kod', max_length=5, unique=True),
+        ),
+    ]
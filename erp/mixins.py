@@ -0,0 +1,312 @@
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+
+from .cache import (
+    LATENCY_BUDGET, STALE_GRACE, get_namespace, get_or_compute, get_tag_versions, get_tagged_entry, should_refresh,
+)
+from .db_router import limit_to_replica_lag
+from .values import compile_values_serializer
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for GenericAPIView subclasses.
+
+    Validators come from max(updated_at) and a row count of the queryset (and of
+    the models nested in the representation), so a matching If-None-Match or
+    If-Modified-Since is answered with 304 before anything is serialized.
+    Lists only get the ETag: deleting a row does not move max(updated_at), so
+    a Last-Modified would keep If-Modified-Since answering 304 after a delete.
+    """
+    conditional_related_models = ()
+
+    def get_validator_querysets(self, queryset):
+        return [queryset, *(model.objects.all() for model in self.conditional_related_models)]
+
+    def get_validators(self, queryset, fingerprint):
+        rows = [
+            validator_queryset.aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+            for validator_queryset in self.get_validator_querysets(queryset)
+        ]
+        state = repr((fingerprint, [(row['last_modified'], row['count']) for row in rows]))
+        etag = f'W/"{hashlib.md5(state.encode()).hexdigest()}"'
+        last_modified = max((row['last_modified'] for row in rows if row['last_modified']), default=None)
+        return etag, last_modified and int(last_modified.timestamp())
+
+    def get_not_modified_response(self, etag, last_modified):
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            self.set_validators(response, etag, last_modified)
+        return response
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+
+    def retrieve(self, request, pk):
+        queryset = self.filter_queryset(self.get_queryset()).filter(pk=pk)
+        etag, last_modified = self.get_validators(queryset, (type(self).__qualname__, pk))
+        not_modified = self.get_not_modified_response(etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(self.get_object())
+        response = Response(serializer.data)
+        self.set_validators(response, etag, last_modified)
+        return response
+
+
+class CachedResponseMixin(ConditionalGetMixin):
+    """
+    List and detail endpoints for GenericAPIView subclasses, served from a cache
+    of the final rendered bytes and headers: a hit is one cache read and an
+    HttpResponse, with no serializer or renderer involved.
+
+    The cache key is a fingerprint of the view, the request URL, the normalized
+    query params, the pagination state, the permission scope and the negotiated
+    format, so every page, search and ordering gets its own entry. Entries are
+    tagged with get_cache_tags() and dropped through erp.cache.invalidate_tags().
+    Misses go through erp.cache.get_or_compute: one request at a time
+    recomputes, entries close to expiry are refreshed early, and a grace copy
+    kept past the timeout is served (marked with X-Cache: STALE) while the
+    database is slow or failing. Entries filled from a replica right after a
+    write are only kept for as long as the replica may lag (see
+    erp.db_router.limit_to_replica_lag).
+    """
+    cache_timeout = 60
+    cache_grace = STALE_GRACE
+    cache_latency_budget = LATENCY_BUDGET
+    cache_namespace = None
+
+    def get_cache_namespace(self):
+        return self.cache_namespace or get_namespace(self.queryset.model)
+
+    def get_cache_tags(self):
+        return [self.get_cache_namespace()]
+
+    def get_cache_scope(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            return 'anon'
+        return 'staff' if user.is_staff else 'user'
+
+    def get_pagination_state(self):
+        paginator = self.paginator
+        if paginator is None:
+            return ()
+        page_size = ('page_size', paginator.get_page_size(self.request))
+        if self.is_keyset_request():
+            # A non-empty cursor is part of the query fingerprint, the empty
+            # one of the first keyset page is not: the mode tells them apart.
+            return (('mode', 'keyset'), page_size)
+        page_query_param = getattr(paginator, 'page_query_param', None)
+        return (
+            ('mode', 'page'),
+            ('page', self.request.query_params.get(page_query_param) or '1'),
+            page_size,
+        )
+
+    def get_query_fingerprint(self):
+        paginator = self.paginator
+        ignored = {
+            getattr(paginator, 'page_query_param', None),
+            getattr(paginator, 'page_size_query_param', None),
+        }
+        return tuple(sorted(
+            (name, tuple(sorted(value for value in values if value != '')))
+            for name, values in self.request.query_params.lists()
+            if name not in ignored and any(value != '' for value in values)
+        ))
+
+    def get_request_fingerprint(self):
+        return repr((
+            f'{type(self).__module__}.{type(self).__qualname__}',
+            # next/previous links in paginated bodies are absolute URLs
+            self.request.build_absolute_uri(self.request.path),
+            self.get_query_fingerprint(),
+            self.get_pagination_state(),
+            self.get_cache_scope(),
+            self.request.accepted_renderer.format,
+        ))
+
+    def is_keyset_request(self):
+        cursor_query_param = getattr(self.paginator, 'cursor_query_param', None)
+        return cursor_query_param is not None and cursor_query_param in self.request.query_params
+
+    def get_list_validators(self, queryset, fingerprint):
+        if not self.is_keyset_request():
+            etag, _ = self.get_validators(queryset, fingerprint)
+            return etag, None
+        # A keyset page exists to avoid scanning the table, so its ETag comes
+        # from the versions of the tags its cache entry is checked against,
+        # which change whenever the cached page would.
+        versions = sorted(get_tag_versions(self.get_cache_tags()).items())
+        state = repr((fingerprint, versions))
+        return f'W/"{hashlib.md5(state.encode()).hexdigest()}"', None
+
+    def get_response_cache_key(self):
+        digest = hashlib.md5(self.get_request_fingerprint().encode()).hexdigest()
+        return f'erp:response:{digest}'
+
+    def get_cached_response(self, cached, stale=False):
+        content, headers, etag, last_modified = cached
+        response = self.get_not_modified_response(etag, last_modified)
+        if response is None:
+            response = HttpResponse(content, headers=dict(headers))
+        if stale:
+            response['X-Cache'] = 'STALE'
+        return response
+
+    def has_conditional_headers(self):
+        return 'HTTP_IF_NONE_MATCH' in self.request.META or 'HTTP_IF_MODIFIED_SINCE' in self.request.META
+
+    def get_cached(self, get_queryset, render, fingerprint, get_validators):
+        cache_key = self.get_response_cache_key()
+        entry = get_tagged_entry(cache_key, self.get_cache_tags())
+        if entry is not None and not should_refresh(entry):
+            return self.get_cached_response(entry.value)
+
+        if entry is None and self.has_conditional_headers():
+            # Revalidate from the aggregate alone, so a matching client never waits for the serializer.
+            not_modified = self.get_not_modified_response(*get_validators(get_queryset(), fingerprint))
+            if not_modified is not None:
+                return not_modified
+
+        def compute():
+            queryset = get_queryset()
+            etag, last_modified = get_validators(queryset, fingerprint)
+            return self.freeze(render(queryset), etag, last_modified)
+
+        entry = get_or_compute(
+            cache_key,
+            compute,
+            self.get_cache_tags(),
+            limit_to_replica_lag(self.cache_timeout),
+            grace=self.cache_grace,
+            latency_budget=self.cache_latency_budget,
+        )
+        return self.get_cached_response(entry.value, stale=entry.stale)
+
+    def freeze(self, response, etag, last_modified):
+        response.accepted_renderer = self.request.accepted_renderer
+        response.accepted_media_type = self.request.accepted_media_type
+        response.renderer_context = self.get_renderer_context()
+        response.render()
+        self.set_validators(response, etag, last_modified)
+        return response.content, tuple(response.items()), etag, last_modified
+
+    def list(self, request):
+        return self.get_cached(
+            lambda: self.filter_queryset(self.get_queryset()),
+            self.render_list,
+            self.get_request_fingerprint(),
+            self.get_list_validators,
+        )
+
+    def retrieve(self, request, pk):
+        return self.get_cached(
+            lambda: self.filter_queryset(self.get_queryset()).filter(pk=pk),
+            self.render_detail,
+            (type(self).__qualname__, pk),
+            self.get_validators,
+        )
+
+    def render_list(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def render_detail(self, queryset):
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data)
+
+
+class ValuesListMixin:
+    """
+    Renders list pages from queryset.values() through a ValuesSerializer
+    compiled from the view's serializer (see erp.values), with the same
+    output; serializers that need model instances go through DRF as before.
+    """
+
+    def render_list(self, queryset):
+        values_serializer = compile_values_serializer(self.get_serializer(), queryset)
+        if values_serializer is None:
+            return super().render_list(queryset)
+
+        rows = queryset.values(*self.get_values_columns(values_serializer, queryset))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.serialize(page))
+        return Response(values_serializer.serialize(rows))
+
+    def get_values_columns(self, values_serializer, queryset):
+        # Keyset pagination reads its position from the ordering columns of the
+        # last row, which ?fields= may have left out; serialize() ignores them.
+        ordering = [name.lstrip('-') for name in queryset.query.order_by if isinstance(name, str)]
+        return list(dict.fromkeys([*values_serializer.columns, *ordering]))
+
+
+class SparseFieldsMixin:
+    """
+    ?fields=id,name limits a GET to the listed fields and ?expand=courses adds
+    nested serializers on top (see erp.serializers.SparseFieldsMixin). The
+    queryset is narrowed to match: only() the columns behind those fields,
+    and no select_related/prefetch_related for relations that were left out.
+    """
+
+    def get_query_list(self, param):
+        if self.request is None or self.request.method != 'GET':
+            return set()
+        return {name.strip() for name in self.request.query_params.get(param, '').split(',') if name.strip()}
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields = self.get_query_list('fields')
+        if fields:
+            context['fields'] = fields
+            context['expand'] = self.get_query_list('expand')
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not self.get_query_list('fields'):
+            return queryset
+        return self.narrow_queryset(queryset, self.get_serializer().fields.values())
+
+    def narrow_queryset(self, queryset, fields):
+        opts = queryset.model._meta
+        columns, select, prefetch = {opts.pk.name}, [], []
+        for field in fields:
+            name, _, path = field.source.partition('.')
+            try:
+                model_field = opts.get_field(name)
+            except FieldDoesNotExist:
+                # A method field or a property may read any attribute.
+                return queryset
+
+            if model_field.one_to_many or model_field.many_to_many:
+                prefetch.append(name)
+                continue
+            columns.add(name)
+            if model_field.is_relation and (path or isinstance(field, BaseSerializer)):
+                select.append(name)
+                if path:
+                    columns.add(f"{name}__{path.replace('.', '__')}")
+        queryset = queryset.select_related(None).prefetch_related(None).only(*columns)
+        if select:
+            # select_related() without arguments would follow every foreign key.
+            queryset = queryset.select_related(*select)
+        return queryset.prefetch_related(*prefetch)
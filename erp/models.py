@@ -1,19 +1,69 @@
 import os
-import random
 from datetime import timedelta
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 from django.utils.text import slugify
 
+from .media import read_video_metadata
+
 
 # Create your models here.
 
+STUDENT_CODE_MIN = 10_000
+STUDENT_CODE_SPACE = 90_000
+# Coprime with STUDENT_CODE_SPACE, so index -> code below is a permutation:
+# consecutive students get scattered codes, every code is used exactly once.
+STUDENT_CODE_MULTIPLIER = 48_271
+STUDENT_CODE_OFFSET = 31_337
+
+
+class StudentCodesExhausted(Exception):
+    pass
+
+
+def student_code_at(index):
+    return str(STUDENT_CODE_MIN + (index * STUDENT_CODE_MULTIPLIER + STUDENT_CODE_OFFSET) % STUDENT_CODE_SPACE)
+
+
+def advance_sequence(name, count):
+    """
+    Take the next `count` values of a sequence, returning the first one: one
+    UPDATE, whose row lock keeps the value read right after it ours until
+    the transaction ends.
+    """
+    sequences = Sequence.objects.filter(name=name)
+    with transaction.atomic():
+        if not sequences.update(value=F('value') + count):
+            # Created by migration 0013, unless a test flushed the table since.
+            Sequence.objects.get_or_create(name=name)
+            sequences.update(value=F('value') + count)
+        return sequences.values_list('value', flat=True).get() - count
+
+
+def reserve_student_codes(count):
+    """
+    Hand out `count` unused student codes: one sequence bump and one lookup
+    per batch, however full the code space is. The lookup only skips codes
+    issued before the allocator existed, which were picked at random.
+    """
+    codes = []
+    while len(codes) < count:
+        needed = count - len(codes)
+        start = advance_sequence('student_code', needed)
+        if start + needed > STUDENT_CODE_SPACE:
+            raise StudentCodesExhausted(f'All {STUDENT_CODE_SPACE} student codes are in use')
+
+        candidates = [student_code_at(index) for index in range(start, start + needed)]
+        taken = set(Student.objects.filter(student_code__in=candidates).values_list('student_code', flat=True))
+        codes += [code for code in candidates if code not in taken]
+    return codes
+
+
 def generate_student_code():
-    while True:
-        code = str(random.randint(10_000, 99_999))
-        if not Student.objects.filter(student_code=code).exists():
-            return code
+    # The field default of migration 0001; Student.save() assigns codes now.
+    return reserve_student_codes(1)[0]
 
 
 def default_deadline():
@@ -27,6 +77,10 @@ class Teacher(models.Model):
     password = models.CharField(max_length=255)
     image = models.ImageField(upload_to='teacher/images/', default='images/default.png')
     username = models.CharField(max_length=30, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['updated_at', 'id'], name='teacher_updated_idx')]
 
     def __str__(self):
         return self.username
@@ -35,12 +89,14 @@ class Teacher(models.Model):
 class Category(models.Model):
     name = models.CharField(max_length=50)
     slug = models.SlugField(max_length=50, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
     class Meta:
         verbose_name_plural = "Categories"
+        indexes = [models.Index(fields=['updated_at', 'id'], name='category_updated_idx')]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -56,6 +112,13 @@ class Course(models.Model):
     category = models.ForeignKey(Category,
                                  on_delete=models.CASCADE,
                                  related_name='courses')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'name'], name='course_category_name_idx'),
+            models.Index(fields=['updated_at', 'id'], name='course_updated_idx'),
+        ]
 
 
 class Group(models.Model):
@@ -75,6 +138,13 @@ class Group(models.Model):
     started_at = models.DateTimeField()
     ended_at = models.DateTimeField()
     status = models.CharField(choices=StatusChoice.choices, default=StatusChoice.NOT_STARTED.value)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='group_status_idx'),
+            models.Index(fields=['updated_at', 'id'], name='group_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -87,6 +157,13 @@ class Module(models.Model):
                               related_name='modules')
     is_given = models.BooleanField(default=False)
     date_passed = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'date_passed'], name='module_group_date_idx'),
+            models.Index(fields=['updated_at', 'id'], name='module_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -101,6 +178,13 @@ class Homework(models.Model):
     module = models.ForeignKey(Module,
                                on_delete=models.CASCADE,
                                related_name='homework')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['module', 'deadline'], name='homework_module_deadline_idx'),
+            models.Index(fields=['updated_at', 'id'], name='homework_updated_idx'),
+        ]
 
     def __str__(self):
         return self.overview
@@ -121,15 +205,26 @@ class Video(models.Model):
         default=StatusChoice.UPLOADING,
         editable=False
     )
+    # Read from the upload once (see erp.media), so nothing has to touch storage to show them.
+    size = models.BigIntegerField(null=True, blank=True, editable=False)
+    checksum = models.CharField(max_length=64, blank=True, editable=False)
+    mime_type = models.CharField(max_length=100, blank=True, editable=False)
+    duration = models.FloatField(null=True, blank=True, editable=False)
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['module', 'status', '-created_at'], name='video_module_status_idx'),
+            models.Index(fields=['updated_at', 'id'], name='video_updated_idx'),
+        ]
 
     @property
     def video_size(self):
-        if self.file and hasattr(self.file, 'path'):
-            try:
-                return os.path.getsize(self.file.path) / (1024 * 1024)  # bytes to MB
-            except FileNotFoundError:
-                return None
-        return None
+        if self.size is None:
+            return None
+        return self.size / (1024 * 1024)  # bytes to MB
 
     @property
     def formatted_size(self):
@@ -140,9 +235,19 @@ class Video(models.Model):
             return f"{size_mb / 1024:.2f} GB"
         return f"{size_mb:.2f} MB"
 
+    def set_metadata(self):
+        for name, value in read_video_metadata(self.file).items():
+            setattr(self, name, value)
+
     def save(self, *args, **kwargs):
         if not self.title and self.file:
             self.title = os.path.basename(self.file.name)
+        if self.file and not self.file._committed:
+            # A file uploaded in one request, read before storage writes it and
+            # ready once this save stores it. Chunked uploads are finished by
+            # erp.uploads.complete_upload instead.
+            self.set_metadata()
+            self.status = self.StatusChoice.READY
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -150,6 +255,32 @@ class Video(models.Model):
 
 
 
+class VideoUpload(models.Model):
+    """A chunked upload in progress (see erp.uploads), deleted once the video is assembled."""
+    class StatusChoice(models.TextChoices):
+        UPLOADING = 'uploading'
+        ASSEMBLING = 'assembling'
+
+    video = models.OneToOneField(Video, on_delete=models.CASCADE, related_name='upload')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True, help_text='Expected SHA-256, checked on completion')
+    # Storage names of the accepted chunks in offset order; a chunk that lost a race is not listed.
+    parts = models.JSONField(default=list, editable=False)
+    status = models.CharField(
+        max_length=10,
+        choices=StatusChoice.choices,
+        default=StatusChoice.UPLOADING,
+        editable=False
+    )
+    assembly_started_at = models.DateTimeField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
+
+
 class Student(models.Model):
     gender_choices = (
         ("MALE", "male"),
@@ -171,7 +302,6 @@ class Student(models.Model):
     student_code = models.CharField(
         max_length=5,
         unique=True,
-        default=generate_student_code,
         editable=False,
         help_text="Avtomatik yaratilgan 5 xonali student kod"
     )
@@ -179,6 +309,38 @@ class Student(models.Model):
                               on_delete=models.SET_NULL,
                               related_name='students',
                               null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_name', 'first_name'], name='student_name_idx'),
+            models.Index(fields=['updated_at', 'id'], name='student_updated_idx'),
+        ]
 
     def __str__(self):
         return self.student_code
+
+    def save(self, *args, **kwargs):
+        # Not a field default: that runs for every Student() built, admin
+        # forms that are only shown or fail validation included.
+        if self._state.adding and not self.student_code:
+            self.student_code = reserve_student_codes(1)[0]
+        super().save(*args, **kwargs)
+
+
+class ObjectCount(models.Model):
+    """Row count of a model, kept up to date by erp.counters."""
+    model = models.CharField(max_length=100, unique=True)
+    count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.model}: {self.count}'
+
+
+class Sequence(models.Model):
+    """Named counter handing out consecutive values, see advance_sequence()."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
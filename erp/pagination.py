@@ -1,12 +1,54 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 
+
+class KeysetPagination(CursorPagination):
+    """
+    Seeks past the last row seen (WHERE pk > ... LIMIT n) instead of an OFFSET,
+    so every page costs the same however deep it is. The total is only counted
+    when asked for with ?count=true.
+    """
+    ordering = 'pk'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        with_count = request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+        self.total = queryset.count() if with_count else None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.total is not None:
+            response['total'] = self.total
+        return Response(response)
+
+
 class CustomPagination(PageNumberPagination):
     page_size = 100
     page_size_query_param = 'page_size'
     max_page_size = 10000
+    cursor_query_param = 'cursor'
+
+    def __init__(self):
+        self.keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # ?cursor= (empty for the first page) switches the request to keyset pagination.
+        if self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
         return Response({
             'page': self.page.number,
             'pages_count': self.page.paginator.num_pages,
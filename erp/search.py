@@ -0,0 +1,81 @@
+import operator
+import re
+from functools import reduce
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramSimilarity
+from django.db import connections
+from django.db.models import Expression, F, Q
+from django.db.models.functions import Greatest
+from rest_framework import filters
+
+from .models import Category, Course, Student, Teacher
+
+SEARCH_VECTOR_COLUMN = 'search_vector'
+
+# Columns folded into the generated search_vector column of each table and
+# given an UPPER(column) gin_trgm_ops index (migration 0015, PostgreSQL only).
+SEARCH_FIELDS = {
+    Category: ['name'],
+    Course: ['name'],
+    Teacher: ['first_name', 'last_name', 'username', 'phone_number'],
+    Student: ['first_name', 'last_name', 'phone_number', 'student_code'],
+}
+
+
+class SearchVectorColumn(Expression):
+    """The generated search_vector column, which is not a model field."""
+    output_field = SearchVectorField()
+
+    def __init__(self, table):
+        super().__init__()
+        self.table = table
+
+    def as_sql(self, compiler, connection):
+        quote = connection.ops.quote_name
+        return f'{quote(self.table)}.{quote(SEARCH_VECTOR_COLUMN)}', []
+
+
+def get_prefix_query(terms):
+    """A tsquery matching every term as a word prefix, or None if nothing is left to match."""
+    words = [word for term in terms for word in re.findall(r'\w+', term)]
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f'{word}:*' for word in words), config='simple', search_type='raw')
+
+
+class SearchFilter(filters.SearchFilter):
+    """
+    DRF's SearchFilter, backed by indexes on PostgreSQL for the models in
+    SEARCH_FIELDS: every term still has to be contained in one of the search
+    fields (the ILIKE is served by the trigram indexes), rows whose
+    search_vector matches all terms as word prefixes are found as well, and
+    results are ranked by full-text rank plus trigram similarity unless the
+    request asks for an ordering. Elsewhere it behaves exactly like DRF's.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if (
+            not search_fields
+            or not search_terms
+            or queryset.model not in SEARCH_FIELDS
+            or connections[queryset.db].vendor != 'postgresql'
+        ):
+            return super().filter_queryset(request, queryset, view)
+
+        search_fields = [field.lstrip('^=@$') for field in search_fields]
+        contains = reduce(operator.and_, [
+            reduce(operator.or_, [Q(**{f'{field}__icontains': term}) for field in search_fields])
+            for term in search_terms
+        ])
+        text = ' '.join(search_terms)
+        similarity = [TrigramSimilarity(field, text) for field in search_fields]
+        rank = Greatest(*similarity) if len(similarity) > 1 else similarity[0]
+
+        query = get_prefix_query(search_terms)
+        if query is not None:
+            queryset = queryset.alias(search_vector=SearchVectorColumn(queryset.model._meta.db_table))
+            contains |= Q(search_vector=query)
+            rank += SearchRank(F('search_vector'), query)
+        return queryset.filter(contains).alias(search_rank=rank).order_by('-search_rank', 'pk')
@@ -1,21 +1,47 @@
+from django.conf import settings
 from rest_framework import serializers
 
-from .models import Category, Course, Module, Group, Homework, Video, Student, Teacher
+from .models import Category, Course, Module, Group, Homework, Video, VideoUpload, Student, Teacher
 
 
-class CourseModelSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Keeps only the fields named in context['fields'] (see erp.mixins.SparseFieldsMixin),
+    plus the nested serializers named in context['expand']. Nested serializers
+    are left whole, and nothing is pruned when context['fields'] is not set.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        if not requested or not self.is_root():
+            return fields
+
+        keep = requested | self.context.get('expand', set())
+        return {name: field for name, field in fields.items() if name in keep}
+
+    def is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+
+class CourseModelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
 
     class Meta:
         model = Course
         fields = '__all__'
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     courses = CourseModelSerializer(many=True, read_only=True)
     slug = serializers.SlugField(read_only=True)
     course_count = serializers.SerializerMethodField(method_name='get_course_count')
 
     def get_course_count(self, instance):
+        if hasattr(instance, 'course_count'):
+            return instance.course_count
         return instance.courses.count()
 
 
@@ -24,14 +50,13 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'slug', 'courses', 'course_count']
 
 
-class GroupSerializer(serializers.ModelSerializer):
-    courses = CourseModelSerializer(many=True, read_only=True)
+class GroupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Group
         fields = ['name','course', 'teacher', 'started_at','ended_at','status']
 
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_code = serializers.CharField(read_only=True)
     group_name = GroupSerializer(read_only=True)
 
@@ -54,7 +79,26 @@ class StudentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class TeacherSerializer(serializers.ModelSerializer):
+class StudentEnrollmentSerializer(StudentSerializer):
+    """
+    Validates one row of a bulk enrollment. The group is looked up in
+    context['groups'] (a pk -> Group dict) instead of one query per row.
+    """
+    group = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta(StudentSerializer.Meta):
+        fields = ['first_name', 'last_name', 'gender', 'phone_number', 'password', 'group']
+
+    def validate_group(self, value):
+        if value is None:
+            return None
+        group = self.context['groups'].get(value)
+        if group is None:
+            raise serializers.ValidationError(f'Invalid pk "{value}" - object does not exist.')
+        return group
+
+
+class TeacherSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Teacher
         fields = '__all__'
@@ -62,13 +106,13 @@ class TeacherSerializer(serializers.ModelSerializer):
 
 
 
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Module
         exclude = ('is_given',)
 
 
-class HomeworkSerializer(serializers.ModelSerializer):
+class HomeworkSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Homework
         fields = '__all__'
@@ -80,13 +124,50 @@ class HomeworkSerializer(serializers.ModelSerializer):
         module.save()
         return homework
 
-class VideoSerializer(serializers.ModelSerializer):
+class VideoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     formatted_size = serializers.ReadOnlyField()
     status = serializers.SerializerMethodField()
 
     class Meta:
         model = Video
-        fields = ['id', 'title', 'file', 'created_at', 'module', 'status', 'formatted_size']
+        fields = [
+            'id', 'title', 'file', 'created_at', 'module', 'status', 'formatted_size',
+            'size', 'checksum', 'mime_type', 'duration', 'width', 'height',
+        ]
 
     def get_status(self, obj):
         return obj.status
+
+
+class VideoUploadSerializer(serializers.ModelSerializer):
+    """Starts a chunked upload (see erp.uploads); the video stays UPLOADING until it is completed."""
+    module = serializers.PrimaryKeyRelatedField(queryset=Module.objects.all(), write_only=True)
+    title = serializers.CharField(max_length=150, required=False, write_only=True)
+    checksum = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False)
+    size = serializers.IntegerField(min_value=1)
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = VideoUpload
+        fields = ['id', 'video', 'module', 'title', 'filename', 'size', 'offset', 'checksum', 'status', 'chunk_size']
+        read_only_fields = ['video', 'offset', 'status']
+
+    def get_chunk_size(self, obj):
+        return settings.VIDEO_UPLOAD_CHUNK_SIZE
+
+
+class ModuleOverviewSerializer(ModuleSerializer):
+    homework = HomeworkSerializer(many=True, read_only=True)
+    videos = VideoSerializer(many=True, read_only=True)
+
+
+class GroupOverviewSerializer(serializers.ModelSerializer):
+    """A group with everything its screen shows, see GroupOverviewApiView."""
+    course = CourseModelSerializer(read_only=True)
+    teacher = TeacherSerializer(read_only=True)
+    students = StudentSerializer(many=True, read_only=True)
+    modules = ModuleOverviewSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Group
+        fields = ['id', 'name', 'course', 'teacher', 'started_at', 'ended_at', 'status', 'students', 'modules']
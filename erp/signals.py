@@ -1,21 +1,118 @@
-from django.core.cache import cache
-from django.db.models.signals import post_save, post_delete
+from collections import Counter
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from .models import Video, Course
+from .cache import invalidate, invalidate_tags
+from .counters import COUNTED_MODELS, adjust_count
+from .db_router import record_write
+from .db_stats import count_connection
+from .models import Video, Course, Category, Group, Homework, Module, Student, Teacher
+
+# Models whose list and detail responses are cached under their own namespace.
+CACHED_MODELS = (Category, Course, Teacher, Group, Module, Homework, Video, Student)
+
+# How each model shown by GroupOverviewApiView finds the group(s) it belongs to.
+OVERVIEW_GROUP_LOOKUPS = {
+    Group: 'pk',
+    Student: 'group',
+    Module: 'group',
+    Homework: 'module__group',
+    Video: 'module__group',
+}
+
+
+def is_cascaded(sender, instance, origin):
+    """Whether a deleted instance went with the deletion of another cached model, whose receivers cover it."""
+    if origin is None or origin is instance:
+        return False
+    origin_model = getattr(origin, 'model', type(origin))
+    return origin_model is not sender and origin_model in CACHED_MODELS
+
+
+def clear_model_cache(sender, instance, signal, raw=False, origin=None, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(record_write)
+    if signal is post_save:
+        invalidate(sender)
+    elif not is_cascaded(sender, instance, origin):
+        # What the delete cascades to is covered here, not by each cascaded row.
+        invalidate(sender, cascade=True)
+
+
+def get_overview_group_ids(sender, pk):
+    """The groups the stored row belongs to, which a save may be about to change."""
+    lookup = OVERVIEW_GROUP_LOOKUPS[sender]
+    return set(sender._base_manager.filter(pk=pk).values_list(lookup, flat=True)) - {None}
+
+
+def get_instance_group_ids(instance):
+    """The group of an instance, read from its own columns where it has them."""
+    if isinstance(instance, Group):
+        return {instance.pk}
+    if isinstance(instance, (Student, Module)):
+        return {instance.group_id} - {None}
+    return get_overview_group_ids(Module, instance.module_id)
+
+
+def remember_overview_groups(sender, instance, raw=False, **kwargs):
+    # A student or module moved to another group stales both groups' overviews.
+    if not raw and not instance._state.adding and instance.pk is not None:
+        instance._overview_group_ids = get_overview_group_ids(sender, instance.pk)
+
+
+def clear_group_overview_cache(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or (sender in (Homework, Video) and is_cascaded(sender, instance, origin)):
+        # A cascaded homework or video goes with its module, whose own post_delete clears the group.
+        return
+    group_ids = vars(instance).pop('_overview_group_ids', set()) | get_instance_group_ids(instance)
+    invalidate_tags(*(f'group:{pk}' for pk in group_ids))
+
+
+for model in CACHED_MODELS:
+    post_save.connect(clear_model_cache, sender=model)
+    post_delete.connect(clear_model_cache, sender=model)
+
+for model in OVERVIEW_GROUP_LOOKUPS:
+    post_save.connect(clear_group_overview_cache, sender=model)
+    post_delete.connect(clear_group_overview_cache, sender=model)
+
+# A group is always its own; only rows pointing at a group or module can move.
+for model in (Student, Module, Homework, Video):
+    pre_save.connect(remember_overview_groups, sender=model)
+
+
+def increment_object_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_count(sender, 1)
+
+
+def tally_deleted_object(sender, instance, origin=None, **kwargs):
+    # The collector sends every pre_delete before it deletes anything, so the
+    # rows are tallied on the origin of the delete and each counter is adjusted
+    # once, on the first post_delete of its model, instead of once per row.
+    if origin is not None:
+        vars(origin).setdefault('_deleted_counts', Counter())[sender] += 1
+
 
+def decrement_object_count(sender, instance, origin=None, **kwargs):
+    if origin is None:
+        adjust_count(sender, -1)
+        return
+    deleted = vars(origin).get('_deleted_counts', {}).pop(sender, 0)
+    if deleted:
+        adjust_count(sender, -deleted)
 
-@receiver(post_save, sender=Video)
-def update_status_to_ready(sender, instance, created, **kwargs):
-    if created:
-        instance.status = Video.StatusChoice.READY
-        instance.save()
 
+for model in COUNTED_MODELS:
+    post_save.connect(increment_object_count, sender=model)
+    pre_delete.connect(tally_deleted_object, sender=model)
+    post_delete.connect(decrement_object_count, sender=model)
 
-@receiver([post_save, post_delete], sender=Course)
-def clear_course_cache(sender, instance, **kwargs):
-    print(">>> CACHE CLEARED")
 
-    for page in range(1, 10000):
-        cache.delete(f'courses_page_{page}_cat_')
-        cache.delete(f'courses_page_{page}_cat_{instance.category_id}')
+@receiver(connection_created)
+def count_database_connection(sender, connection, **kwargs):
+    count_connection(connection.alias)
@@ -0,0 +1,107 @@
+import mmap
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .media import get_local_path, get_mime_type
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    The (start, end) byte positions, end included, asked for by a single-range
+    Range header, or None to send the whole file: no header, several ranges or
+    a syntax we do not understand. Raises RangeNotSatisfiable when the range
+    lies past the end of the file.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # bytes=-500 is the last 500 bytes.
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def iter_mapped(path, start, end):
+    # The file is paged in by the kernel as the slices are sent.
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for position in range(start, end + 1, CHUNK_SIZE):
+            yield mapped[position:min(position + CHUNK_SIZE, end + 1)]
+
+
+def iter_storage(field_file, start, end):
+    with field_file.open('rb') as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining:
+            data = file.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                return
+            remaining -= len(data)
+            yield data
+
+
+def get_content_type(video):
+    return video.mime_type or get_mime_type(video.file.name)
+
+
+def get_accel_response(video):
+    """Let nginx send the file, Range requests included, from its internal location."""
+    response = HttpResponse(content_type=get_content_type(video))
+    response['X-Accel-Redirect'] = settings.VIDEO_ACCEL_PREFIX + quote(video.file.name)
+    return response
+
+
+def get_range_response(request, video):
+    """
+    Serve the video from Django, for runs without nginx: 206 Partial Content
+    for a satisfiable byte range, 416 past the end and 200 otherwise. Local
+    files are memory-mapped, other storages read with seek().
+    """
+    size = video.size if video.size is not None else video.file.size
+    etag = f'"{video.checksum}"' if video.checksum else None
+    headers = {'Accept-Ranges': 'bytes'}
+    if etag:
+        headers['ETag'] = etag
+
+    if_range = request.headers.get('If-Range')
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size) if not if_range or if_range == etag else None
+    except RangeNotSatisfiable:
+        headers['Content-Range'] = f'bytes */{size}'
+        return HttpResponse(status=416, headers=headers)
+
+    if size == 0:
+        return HttpResponse(b'', content_type=get_content_type(video), headers=headers)
+    start, end = byte_range or (0, size - 1)
+    if byte_range is not None:
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Length'] = str(end - start + 1)
+
+    path = get_local_path(video.file)
+    content = iter_mapped(path, start, end) if path else iter_storage(video.file, start, end)
+    return StreamingHttpResponse(
+        content,
+        status=206 if byte_range is not None else 200,
+        content_type=get_content_type(video),
+        headers=headers,
+    )
@@ -1,3 +1,1295 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models.deletion import Collector
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from rest_framework.permissions import AllowAny
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from erp.cache import (
+    acquire_lock, get_or_compute, get_tag_versions, get_tagged_entry, invalidate, invalidate_tags, set_tagged,
+)
+from erp.cache_backends import (
+    GENERATION_KEY, MISSING, LocalStore, ThresholdZlibCompressor, TwoTierCache, _stores,
+)
+from erp.circuit_breaker import database_breaker
+from erp.counters import get_counts
+from erp.db_stats import get_pool_stats
+from erp.db_router import ReplicaRouter, ReplicaRoutingMiddleware, _health, is_healthy
+from erp.enrollment import enroll_students
+from erp.management.commands.cache_benchmark import make_page
+from erp.mixins import CachedResponseMixin
+from erp.models import (
+    Category, Course, Group, Homework, Module, ObjectCount, Sequence, Student, Teacher, Video,
+    VideoUpload, reserve_student_codes, student_code_at,
+)
+from erp.serializers import CategorySerializer, CourseModelSerializer
+from erp.uploads import write_chunk
+from erp.values import compile_values_serializer
+from erp.views import CategoryApiView, GroupOverviewApiView, StudentApiView
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def run_concurrently(target, threads=20):
+    barrier = threading.Barrier(threads)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(target())
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ApiTestCase(TestCase):
+    """An API client logged in as a staff user, against an empty local-memory cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('admin', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class GroupTestCase(ApiTestCase):
+    """ApiTestCase with group N1 of the Django course, in the Backend category."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.category = Category.objects.create(name='Backend')
+        cls.course = Course.objects.create(name='Django', description='', price=100, category=cls.category)
+        cls.group = Group.objects.create(
+            name='N1', course=cls.course, started_at='2025-01-01T09:00Z', ended_at='2025-05-01T09:00Z',
+        )
+
+
+class VideoTestCase(GroupTestCase):
+    """GroupTestCase with module ORM to put videos in, stored under a temporary MEDIA_ROOT."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.module = Module.objects.create(title='ORM', group=cls.group)
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def compute(self, duration=0.1):
+        with self.lock:
+            self.calls += 1
+        time.sleep(duration)
+        return {'total': 1}
+
+    def test_concurrent_misses_compute_once(self):
+        results = run_concurrently(lambda: get_or_compute('stampede', self.compute, ['category'], 60).value)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'total': 1}] * 20)
+
+    def test_query_rate_stays_flat_at_expiry(self):
+        timeout, now = 30, [time.time()]
+
+        def query():
+            self.calls += 1
+            return {'total': self.calls}
+
+        def compute():
+            value = query()
+            # The other clients ask while this one still holds the lock.
+            for _ in range(15):
+                get_or_compute('load', query, ['category'], timeout, latency_budget=None)
+            return value
+
+        clock = mock.patch('time.time', lambda: now[0])
+        # No early refresh, so each entry is recomputed exactly at its expiry.
+        no_jitter = mock.patch('erp.cache.random.random', return_value=1.0)
+        with clock, no_jitter:
+            get_or_compute('load', query, ['category'], timeout)
+            for window in range(1, 6):
+                now[0] += timeout
+                entry = get_or_compute('load', compute, ['category'], timeout, latency_budget=None)
+                # Without single flight every client recomputes at each expiry.
+                self.assertEqual(self.calls, window + 1)
+                self.assertEqual(entry.value, {'total': window + 1})
+
+    def test_list_view_recomputes_once(self):
+        factory = APIRequestFactory()
+        view = CategoryApiView.as_view()
+        user = User(username='admin', is_staff=True)
+
+        def render_list(view_self, queryset):
+            return Response(self.compute())
+
+        def request():
+            request = factory.get('/api/categories/')
+            force_authenticate(request, user=user)
+            return view(request).status_code
+
+        validators = mock.patch.object(CategoryApiView, 'get_validators', return_value=('W/"etag"', None))
+        with validators, mock.patch.object(CategoryApiView, 'render_list', render_list):
+            statuses = run_concurrently(request)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(statuses, [200] * 20)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class InvalidationTests(SimpleTestCase):
+    namespaces = ('category', 'course', 'teacher', 'group', 'module', 'homework', 'video', 'student')
+
+    def setUp(self):
+        cache.clear()
+        for namespace in self.namespaces:
+            set_tagged(namespace, namespace, get_tag_versions([namespace]), 60)
+
+    def dropped(self):
+        return {namespace for namespace in self.namespaces if get_tagged_entry(namespace).stale}
+
+    def test_write_drops_only_its_namespace(self):
+        invalidate(Teacher)
+        self.assertEqual(self.dropped(), {'teacher'})
+
+    def test_course_and_category_drop_each_other(self):
+        invalidate(Course)
+        self.assertEqual(self.dropped(), {'course', 'category'})
+        self.setUp()
+        invalidate(Category)
+        self.assertEqual(self.dropped(), {'category', 'course'})
+
+    def test_delete_drops_the_namespaces_it_cascades_to(self):
+        invalidate(Module, cascade=True)
+        self.assertEqual(self.dropped(), {'module', 'homework', 'video'})
+        self.setUp()
+        invalidate(Teacher, cascade=True)
+        self.assertEqual(self.dropped(), {'teacher', 'group', 'module', 'homework', 'video', 'student'})
+        self.setUp()
+        invalidate(Category, cascade=True)
+        self.assertEqual(self.dropped(), set(self.namespaces) - {'teacher'})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class StaleCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        get_or_compute('courses', lambda: 'cached', ['course'], 60)
+        invalidate_tags('course')
+
+    def raise_database_error(self):
+        raise OperationalError('server closed the connection unexpectedly')
+
+    def test_serves_stale_copy_when_database_fails(self):
+        with self.assertLogs('erp.cache', 'WARNING'):
+            entry = get_or_compute('courses', self.raise_database_error, ['course'], 60)
+
+        self.assertEqual(entry.value, 'cached')
+        self.assertTrue(entry.stale)
+
+    def test_serves_stale_copy_when_recompute_is_slow(self):
+        def slow():
+            time.sleep(0.3)
+            return 'fresh'
+
+        entry = get_or_compute('courses', slow, ['course'], 60, latency_budget=0.05)
+        self.assertEqual(entry.value, 'cached')
+
+        time.sleep(0.4)
+        self.assertEqual(get_or_compute('courses', self.raise_database_error, ['course'], 60).value, 'fresh')
+
+    def test_open_circuit_stops_database_calls(self):
+        with self.assertLogs('erp.cache', 'WARNING'):
+            for _ in range(database_breaker.failure_threshold):
+                get_or_compute('courses', self.raise_database_error, ['course'], 60)
+        self.assertFalse(database_breaker.allow())
+
+        compute = mock.Mock(return_value='fresh')
+        entry = get_or_compute('courses', compute, ['course'], 60)
+
+        compute.assert_not_called()
+        self.assertEqual(entry.value, 'cached')
+
+
+@override_settings(CACHES={**LOCMEM_CACHE, 'shared': {**LOCMEM_CACHE['default'], 'LOCATION': 'l2'}})
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        _stores.clear()
+        self.addCleanup(_stores.clear)
+
+    def worker(self, channel='worker-1'):
+        # Each channel gets its own L1, which stands in for another worker process here.
+        return TwoTierCache('shared', {
+            'TIMEOUT': 60, 'OPTIONS': {'MAX_ENTRIES': 3, 'CHANNEL': channel, 'POLL_INTERVAL': 0},
+        })
+
+    def in_l1(self, tier, key):
+        return tier.store.get(tier.make_key(key)) is not MISSING
+
+    def test_l1_evicts_least_recently_used(self):
+        tier = self.worker()
+        for key in 'abc':
+            tier.set(key, key)
+        tier.get('a')
+        tier.set('d', 'd')
+
+        self.assertEqual([self.in_l1(tier, key) for key in 'abcd'], [True, False, True, True])
+        self.assertEqual(tier.get('b'), 'b')
+
+    def test_stats(self):
+        tier = self.worker()
+        tier.set('a', 1)
+        tier.get('a')
+        tier.store.forget('*')
+        tier.get('a')
+        tier.get('missing')
+
+        stats = tier.stats()
+        self.assertEqual((stats['l1_hits'], stats['l2_hits'], stats['misses'], stats['l1_size']), (1, 1, 1, 1))
+        self.assertAlmostEqual(stats['l1_hit_ratio'], 1 / 3)
+        self.assertEqual(stats['invalidation'], 'poll')
+
+    def test_polling_workers_drop_l1_when_a_tag_changes(self):
+        writer, reader = self.worker('worker-1'), self.worker('worker-2')
+        writer.set('erp:tag:course', 'v1')
+        self.assertEqual(reader.get('erp:tag:course'), 'v1')
+
+        writer.set('erp:tag:course', 'v2')
+        self.assertEqual(reader.get('erp:tag:course'), 'v2')
+
+    def test_other_writes_are_not_announced(self):
+        writer, reader = self.worker('worker-1'), self.worker('worker-2')
+        writer.set('erp:response:page', 1)
+        self.assertEqual(reader.get('erp:response:page'), 1)
+
+        writer.set('erp:response:page', 2)
+        writer.add('erp:response:page:lock', 'token')
+        writer.delete('erp:response:page:lock')
+        writer.incr('erp:response:page')
+        # The reader keeps its copy until the L1 timeout, the generation never moved.
+        self.assertEqual(reader.get('erp:response:page'), 1)
+        self.assertIsNone(caches['shared'].get(GENERATION_KEY))
+
+    def test_pubsub_evicts_keys_written_by_other_workers(self):
+        store = LocalStore(10)
+        store.set('a', 1, 60)
+        store.set('b', 2, 60)
+        store.subscribed = True
+
+        def listen():
+            yield {'data': b'other-worker a'}
+            yield {'data': f'{store.node_id} b'.encode()}
+            self.assertEqual((store.get('a'), store.get('b')), (MISSING, 2))
+
+        store.listen(mock.Mock(listen=listen))
+        # Losing the subscription may have lost messages, so everything goes.
+        self.assertEqual((store.get('b'), store.subscribed), (MISSING, False))
+
+    def test_lock_waiters_read_past_their_l1(self):
+        writer, waiter = self.worker('worker-1'), self.worker('worker-2')
+        compute = mock.Mock(return_value='old')
+        with mock.patch('erp.cache.cache', waiter):
+            get_or_compute('page', compute, ['course'], 60)
+
+        # The writer invalidates the page and, holding the lock, stores the new one.
+        with mock.patch('erp.cache.cache', writer):
+            invalidate_tags('course')
+            self.assertIsNotNone(acquire_lock('page'))
+            set_tagged('page', 'new', get_tag_versions(['course']), 60)
+        # What pub/sub delivers: the tag version goes, the waiter's copy of the page stays.
+        waiter.store.subscribed = True
+        waiter.store.forget(waiter.make_key('erp:tag:course'))
+
+        with mock.patch('erp.cache.cache', waiter):
+            entry = get_or_compute('page', compute, ['course'], 60)
+        self.assertEqual((entry.value, entry.stale, compute.call_count), ('new', False, 1))
+
+    def test_only_invalidations_are_published(self):
+        tier = self.worker()
+        tier.store.redis = mock.Mock()
+        publish = tier.store.redis.pipeline.return_value.publish
+
+        tier.set('erp:response:page', 1)
+        publish.assert_not_called()
+        tier.set_many({'erp:tag:course': 'v1', 'erp:response:page': 1})
+        publish.assert_called_once_with('worker-1', f'{tier.store.node_id} {tier.make_key("erp:tag:course")}')
+
+
+class RedisProfileTests(SimpleTestCase):
+    def setUp(self):
+        from django_redis.cache import RedisCache
+
+        # Same options as the REDIS_URL profile in settings; nothing connects until a command is sent.
+        self.client = RedisCache('redis://127.0.0.1:6379/15', {'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'COMPRESSOR': 'erp.cache_backends.ThresholdZlibCompressor',
+            'COMPRESS_MIN_LENGTH': 1024,
+        }}).client
+
+    def test_small_values_are_stored_uncompressed(self):
+        version = 'abcdef0123456789'
+        self.assertEqual(self.client.encode(version), self.client._serializer.dumps(version))
+        self.assertEqual(self.client.decode(self.client.encode(version)), version)
+
+    def test_large_pages_are_compressed(self):
+        page = make_page(1000)
+        encoded = self.client.encode(page)
+
+        self.assertLess(len(encoded), len(self.client._serializer.dumps(page)) / 4)
+        self.assertEqual(self.client.decode(encoded), page)
+
+    def test_compressor_threshold_comes_from_options(self):
+        compressor = ThresholdZlibCompressor({'COMPRESS_MIN_LENGTH': 10})
+        self.assertEqual(compressor.compress(b'x' * 10), b'x' * 10)
+        self.assertNotEqual(compressor.compress(b'x' * 11), b'x' * 11)
+
+    @override_settings(REDIS_URL='redis://cache:6379/0')
+    def test_benchmark_refuses_the_application_redis(self):
+        with self.assertRaisesMessage(CommandError, '--allow-app-redis'):
+            call_command('cache_benchmark', '--redis-url', 'redis://cache:6379/0', stdout=io.StringIO())
+
+
+class CategoryQueryCountTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(30):
+            category = Category.objects.create(name=f'Category {i}')
+            Course.objects.bulk_create(
+                Course(name=f'Course {j}', description='', price=100, category=category) for j in range(3)
+            )
+
+    def test_category_list_queries_do_not_grow_with_page_size(self):
+        # ETag/Last-Modified aggregates for both models, the page count, the page and the course prefetch.
+        for page_size in (1, 10, 30):
+            cache.clear()
+            with self.assertNumQueries(5):
+                response = self.client.get('/api/categories/', {'page_size': page_size})
+            self.assertEqual(len(response.json()['results']), page_size)
+            self.assertEqual(response.json()['results'][0]['course_count'], 3)
+
+
+@mock.patch.object(CategoryApiView, 'permission_classes', [AllowAny])
+class ResponseCacheKeyTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.users = {'anon': None, 'user': User.objects.create_user('user'), 'staff': cls.user}
+        for name in ('Backend', 'Frontend', 'Mobile'):
+            Category.objects.create(name=name)
+
+    def get(self, scope, params):
+        client = APIClient()
+        client.force_authenticate(self.users[scope])
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/categories/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.content, len(queries)
+
+    def test_every_variant_gets_its_own_entry(self):
+        variants = [
+            {}, {'page': 2, 'page_size': 1}, {'page': 3, 'page_size': 1}, {'page_size': 2},
+            {'ordering': 'name'}, {'ordering': '-name'},
+        ]
+        for scope in self.users:
+            for params in variants:
+                with self.subTest(scope=scope, params=params):
+                    content, queries = self.get(scope, params)
+                    self.assertGreater(queries, 0, 'served from another variant\'s entry')
+                    self.assertEqual(self.get(scope, params), (content, 0))
+
+    def test_hit_skips_the_serializer(self):
+        content, _ = self.get('staff', {'page_size': 2})
+        with mock.patch.object(CategorySerializer, 'to_representation', side_effect=AssertionError):
+            self.assertEqual(self.get('staff', {'page_size': 2}), (content, 0))
+
+
+@mock.patch.object(CategoryApiView, 'cache_latency_budget', None)
+class ConditionalGetTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.categories = [Category.objects.create(name=name) for name in ('Backend', 'Frontend')]
+
+    def test_list_is_modified_after_a_delete(self):
+        response = self.client.get('/api/categories/')
+        self.assertNotIn('Last-Modified', response)
+        since = http_date(time.time() + 60)
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.categories[1].delete()
+        for headers in ({'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_MODIFIED_SINCE': since}):
+            self.assertEqual(self.client.get('/api/categories/', **headers).status_code, 200)
+
+    def test_detail_keeps_last_modified(self):
+        response = self.client.get(f'/api/categories/{self.categories[0].pk}/')
+        self.assertIn('Last-Modified', response)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ObjectCountTests(TestCase):
+    def test_counters_follow_writes_and_cascades(self):
+        category = Category.objects.create(name='Backend')
+        Course.objects.create(name='Django', description='', price=100, category=category)
+        self.assertEqual(get_counts((Category, Course)), {Category: 1, Course: 1})
+
+        category.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_counts((Category, Course)), {Category: 0, Course: 0})
+
+    def test_cascade_adjusts_each_counter_once(self):
+        category = Category.objects.create(name='Backend')
+        for i in range(20):
+            Course.objects.create(name=f'Course {i}', description='', price=100, category=category)
+
+        with CaptureQueriesContext(connection) as queries:
+            category.delete()
+        updates = [query['sql'] for query in queries if 'erp_objectcount' in query['sql']]
+        self.assertEqual(len(updates), 2, updates)
+        self.assertEqual(get_counts((Category, Course)), {Category: 0, Course: 0})
+
+        Course.objects.create(name='Go', description='', price=100, category=Category.objects.create(name='Go'))
+        Course.objects.all().delete()
+        self.assertEqual(get_counts((Category, Course)), {Category: 1, Course: 0})
+
+    def test_other_models_keep_fast_deletes(self):
+        self.assertTrue(Collector(using='default', origin=None).can_fast_delete(Session))
+
+    def test_reconcile_fixes_drift(self):
+        Category.objects.bulk_create([Category(name='a', slug='a'), Category(name='b', slug='b')])
+        call_command('reconcile_counts', stdout=io.StringIO())
+
+        self.assertEqual(ObjectCount.objects.get(model='erp.category').count, 2)
+
+
+@mock.patch.object(CachedResponseMixin, 'cache_latency_budget', None)
+class ModelInvalidationTests(GroupTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.teacher = Teacher.objects.create(first_name='Aziz', last_name='', phone_number='', password='', username='aziz')
+        cls.group.teacher = cls.teacher
+        cls.group.save()
+        cls.module = Module.objects.create(title='ORM', group=cls.group)
+
+    def total(self, url):
+        return self.client.get(url).json()['total']
+
+    def test_writes_outside_the_api_refresh_the_lists(self):
+        # Admin, shell and management command writes go through the same signals as the API.
+        writes = {
+            '/api/categories/': lambda: Category.objects.create(name='Frontend'),
+            '/api/courses/': lambda: Course.objects.create(name='Go', description='', price=1, category=self.category),
+            '/api/teachers/': lambda: Teacher.objects.create(
+                first_name='Ali', last_name='', phone_number='', password='', username='ali',
+            ),
+            '/api/groups/': lambda: Group.objects.create(
+                name='N2', course=self.course, started_at='2025-01-01T09:00Z', ended_at='2025-05-01T09:00Z',
+            ),
+            '/api/modules/': lambda: Module.objects.create(title='Views', group=self.group),
+            '/api/homeworks/': lambda: Homework.objects.create(
+                overview='Task', file='homework/files/task.pdf', module=self.module,
+            ),
+            '/api/videos/': lambda: Video.objects.create(title='Lesson', file='videos/lesson.mp4', module=self.module),
+            '/api/students/': lambda: Student.objects.create(
+                first_name='Ali', last_name='', phone_number='', password='',
+            ),
+        }
+        for url, write in writes.items():
+            with self.subTest(url=url):
+                before = self.total(url)
+                write()
+                self.assertEqual(self.total(url), before + 1)
+
+    def test_deletes_refresh_the_lists_they_cascade_to(self):
+        self.assertEqual((self.total('/api/groups/'), self.total('/api/modules/')), (1, 1))
+        self.teacher.delete()
+        self.course.delete()
+        for url in ('/api/teachers/', '/api/groups/', '/api/modules/'):
+            self.assertEqual(self.total(url), 0, url)
+
+
+class KeysetPaginationTests(GroupTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(25):
+            Student.objects.create(first_name=f'Student {i}', last_name='', phone_number='', password='', group=cls.group)
+
+    def test_walks_every_page_with_constant_queries(self):
+        url, seen = '/api/students/?cursor=&page_size=10', []
+        while url:
+            # Only the page itself: no COUNT(*) and no table-wide ETag aggregate.
+            with self.assertNumQueries(1):
+                data = self.client.get(url).json()
+            self.assertNotIn('total', data)
+            seen += [student['id'] for student in data['results']]
+            url = data['next']
+
+        self.assertEqual(seen, sorted(Student.objects.values_list('pk', flat=True)))
+
+    def test_first_keyset_page_has_its_own_entry(self):
+        self.assertIn('pages_count', self.client.get('/api/students/?page_size=10').json())
+        data = self.client.get('/api/students/?cursor=&page_size=10').json()
+        self.assertNotIn('pages_count', data)
+        self.assertEqual(len(data['results']), 10)
+
+    def test_count_on_request(self):
+        data = self.client.get('/api/students/', {'cursor': '', 'page_size': 10, 'count': 'true'}).json()
+        self.assertEqual((len(data['results']), data['total']), (10, 25))
+
+    @mock.patch.object(StudentApiView, 'cache_latency_budget', None)
+    def test_etag_follows_writes(self):
+        url = '/api/students/?cursor=&page_size=10'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.delete(f'/api/students/{Student.objects.order_by("pk").first().pk}/')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ExportTests(GroupTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.modules = [Module.objects.create(title=f'Module {i}', group=cls.group) for i in range(2)]
+        for module in cls.modules:
+            Homework.objects.bulk_create(
+                Homework(overview=f'{module.title} task {i}', file='homework/files/task.pdf', module=module)
+                for i in range(3)
+            )
+
+    def test_streams_rows_with_list_filters(self):
+        response = self.client.get('/api/export/homeworks/ndjson/', {'module_id': self.modules[0].pk})
+
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['overview'] for row in rows], [f'Module 0 task {i}' for i in range(3)])
+
+    def test_csv_has_header_row(self):
+        response = self.client.get('/api/export/groups/csv/')
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,name,course,teacher,started_at,ended_at,status')
+        self.assertEqual(len(lines), 2)
+
+    def test_command_writes_to_its_stdout(self):
+        out = io.StringIO()
+        call_command('export_data', 'homeworks', '--format', 'ndjson', '--query', f'module_id={self.modules[1].pk}', stdout=out)
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['overview'] for row in rows], [f'Module 1 task {i}' for i in range(3)])
+
+
+class StudentCodeTests(TestCase):
+    def create_student(self, **kwargs):
+        return Student.objects.create(first_name='Ali', last_name='Valiyev', phone_number='', password='', **kwargs)
+
+    def test_reserved_codes_are_unique_five_digit_codes(self):
+        codes = reserve_student_codes(500) + reserve_student_codes(500)
+
+        self.assertEqual(len(set(codes)), 1000)
+        self.assertTrue(all(len(code) == 5 and code.isdigit() for code in codes))
+
+    def test_skips_codes_already_taken(self):
+        legacy = self.create_student(student_code=student_code_at(1))
+
+        codes = reserve_student_codes(3)
+        self.assertNotIn(legacy.student_code, codes)
+        self.assertEqual(len(codes), 3)
+        self.assertNotEqual(self.create_student().student_code, legacy.student_code)
+
+    def test_only_saving_a_new_student_takes_a_code(self):
+        with self.assertNumQueries(0):
+            student = Student(first_name='Ali', last_name='Valiyev', phone_number='', password='')
+        self.assertEqual(student.student_code, '')
+
+        student.save()
+        code = student.student_code
+        student.save()
+        self.assertEqual((len(code), student.student_code), (5, code))
+
+    def test_reserving_is_one_update_and_one_read(self):
+        with CaptureQueriesContext(connection) as queries:
+            reserve_student_codes(10)
+
+        statements = [query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']]
+        # The sequence bump, its value, then the codes issued before the allocator.
+        self.assertEqual(statements, ['UPDATE', 'SELECT', 'SELECT'])
+
+
+class BulkEnrollmentTests(GroupTestCase):
+    def student(self, number, **kwargs):
+        return {
+            'first_name': f'Student {number}', 'last_name': 'Valiyev', 'phone_number': '+998901234567',
+            'password': 'secret', 'group': self.group.pk, **kwargs,
+        }
+
+    def test_enrolls_in_bulk(self):
+        response = self.client.post('/api/students/bulk/', [self.student(i) for i in range(300)], format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Student.objects.filter(group=self.group).count(), 300)
+        self.assertEqual(len(set(response.json()['student_codes'])), 300)
+        self.assertEqual(ObjectCount.objects.get(model='erp.student').count, 300)
+
+    def test_reserves_codes_once_per_batch(self):
+        rows = [self.student(i) for i in range(100)]
+        with CaptureQueriesContext(connection) as queries:
+            students, errors = enroll_students(rows)
+
+        self.assertEqual((len(students), errors), (100, {}))
+        self.assertEqual(Sequence.objects.get(name='student_code').value, 100)
+        self.assertLess(len(queries), 20)
+
+    def test_reports_row_errors_and_creates_nothing(self):
+        rows = [self.student(1), self.student(2, group=10**6), self.student(3, gender='unknown')]
+        response = self.client.post('/api/students/bulk/', rows, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.json()['errors']], [2, 3])
+        self.assertFalse(Student.objects.exists())
+
+    def test_rows_that_are_not_objects_are_row_errors(self):
+        response = self.client.post('/api/students/bulk/', [self.student(1), 1, 2], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.json()['errors']], [2, 3])
+
+    def test_failed_insert_gives_the_codes_back(self):
+        with mock.patch.object(Student.objects, 'bulk_create', side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                enroll_students([self.student(1)])
+
+        self.assertEqual(Sequence.objects.get(name='student_code').value, 0)
+
+    def test_csv_that_is_not_utf8_is_refused(self):
+        file = io.BytesIO('first_name,last_name\nAlí,Valiyev\n'.encode('latin-1'))
+        file.name = 'students.csv'
+        response = self.client.post('/api/students/bulk/', {'file': file}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('UTF-8', response.json()['detail'])
+
+    def test_csv_upload(self):
+        file = io.BytesIO(b'first_name,last_name,gender,phone_number,password,group\nAli,Valiyev,MALE,1,secret,\n')
+        file.name = 'students.csv'
+        response = self.client.post('/api/students/bulk/', {'file': file}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(Student.objects.get().group)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are checked against PostgreSQL only')
+class QueryPlanTests(ApiTestCase):
+    """
+    EXPLAIN every query of the list endpoints with seq scans disabled: on a
+    small seeded table the planner would pick them anyway, so this checks
+    that an index serves each access path, not which plan is cheapest now.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        categories = Category.objects.bulk_create(Category(name=f'Category {i}', slug=f'category-{i}') for i in range(5))
+        courses = Course.objects.bulk_create(
+            Course(name=f'Course {i}', description='', price=100, category=categories[i % 5]) for i in range(50)
+        )
+        teachers = Teacher.objects.bulk_create(
+            Teacher(first_name='T', last_name=f'{i}', phone_number='', password='', username=f'teacher{i}')
+            for i in range(20)
+        )
+        groups = Group.objects.bulk_create(
+            Group(
+                name=f'Group {i}', course=courses[i % 50], teacher=teachers[i % 20],
+                started_at='2025-01-01T09:00Z', ended_at='2025-05-01T09:00Z',
+                status=Group.StatusChoice.values[i % 3],
+            )
+            for i in range(200)
+        )
+        modules = Module.objects.bulk_create(Module(title=f'Module {i}', group=groups[i % 200]) for i in range(1000))
+        Homework.objects.bulk_create(
+            Homework(overview=f'Homework {i}', file='homework/files/task.pdf', module=modules[i % 1000])
+            for i in range(5000)
+        )
+        Video.objects.bulk_create(
+            Video(title=f'Video {i}', file='videos/lesson.mp4', module=modules[i % 1000], status=Video.StatusChoice.READY)
+            for i in range(5000)
+        )
+        Student.objects.bulk_create(
+            Student(
+                first_name=f'First {i}', last_name=f'Last {i % 997}', phone_number='', password='',
+                student_code=code, group=groups[i % 200],
+            )
+            for i, code in enumerate(reserve_student_codes(10000))
+        )
+        cls.ids = {'category': categories[0].pk, 'group': groups[0].pk, 'module': modules[0].pk}
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        super().setUp()
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def assert_uses_indexes(self, url, params, indexes):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+
+        plans = [self.explain(query['sql']) for query in queries if query['sql'].startswith('SELECT')]
+        for plan in plans:
+            self.assertNotIn('Seq Scan', plan, f'{url} {params}:\n{plan}')
+        for index in indexes:
+            self.assertIn(index, '\n'.join(plans), f'{url} {params}')
+
+    def test_list_endpoints_use_indexes(self):
+        # Unfiltered validators, max(updated_at) and count(pk) over a whole
+        # table, are answered from the (updated_at, id) index alone.
+        ids = self.ids
+        endpoints = [
+            ('/api/categories/', {}, ['category_updated_idx', 'course_updated_idx']),
+            (
+                '/api/courses/',
+                {'category': ids['category'], 'ordering': 'name'},
+                ['course_category_name_idx', 'category_updated_idx'],
+            ),
+            ('/api/teachers/', {}, ['teacher_updated_idx']),
+            ('/api/groups/', {'status': 'Active'}, ['group_status_idx']),
+            ('/api/modules/', {'group_id': ids['group'], 'ordering': 'date_passed'}, ['module_group_date_idx']),
+            ('/api/homeworks/', {'module_id': ids['module'], 'ordering': 'deadline'}, ['homework_module_deadline_idx']),
+            (
+                '/api/videos/',
+                {'module_id': ids['module'], 'status': 'ready', 'ordering': '-created_at'},
+                ['video_module_status_idx'],
+            ),
+            ('/api/students/', {'ordering': 'last_name,first_name'}, ['student_name_idx', 'student_updated_idx']),
+        ]
+        for url, params, indexes in endpoints:
+            with self.subTest(url=url, params=params):
+                self.assert_uses_indexes(url, params, indexes)
+
+
+class SearchTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for first_name, last_name, phone_number in [
+            ('Ali', 'Valiyev', '+998901112233'),
+            ('Alisher', 'Karimov', '+998907778899'),
+            ('Madina', 'Aliyeva', '+998935554433'),
+        ]:
+            Student.objects.create(first_name=first_name, last_name=last_name, phone_number=phone_number, password='')
+
+    def search(self, term):
+        results = self.client.get('/api/students/', {'search': term}).json()['results']
+        return [student['first_name'] for student in results]
+
+    def test_every_term_must_match(self):
+        self.assertCountEqual(self.search('ali'), ['Ali', 'Alisher', 'Madina'])
+        self.assertEqual(self.search('ali valiyev'), ['Ali'])
+        self.assertEqual(self.search('777'), ['Alisher'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Ranking needs the PostgreSQL search indexes')
+    def test_ranks_closest_match_first(self):
+        self.assertEqual(self.search('ali')[0], 'Ali')
+
+
+@override_settings(CACHES=LOCMEM_CACHE, DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        _health.clear()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(self.read_database)
+        healthy = mock.patch('erp.db_router.is_healthy', return_value=True)
+        healthy.start()
+        self.addCleanup(healthy.stop)
+
+    def read_database(self, request):
+        request.database = ReplicaRouter().db_for_read(Student)
+        return Response()
+
+    def request(self, method, **headers):
+        request = getattr(self.factory, method)('/api/students/', **headers)
+        self.middleware(request)
+        return request.database
+
+    def test_reads_go_to_replicas_and_writes_to_primary(self):
+        self.assertEqual(self.request('get'), 'replica')
+        self.assertIsNone(self.request('post'))
+        self.assertEqual(ReplicaRouter().db_for_write(Student), 'default')
+
+    def test_client_sticks_to_primary_after_writing(self):
+        self.request('post', HTTP_AUTHORIZATION='Bearer writer')
+
+        self.assertIsNone(self.request('get', HTTP_AUTHORIZATION='Bearer writer'))
+        self.assertEqual(self.request('get', HTTP_AUTHORIZATION='Bearer reader'), 'replica')
+
+    def test_outside_requests_use_primary(self):
+        self.assertIsNone(ReplicaRouter().db_for_read(Student))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=5, REPLICA_MAX_LAG=5)
+class ReplicaCacheTests(ApiTestCase):
+    def fill_timeout(self, url, target='erp.mixins.get_or_compute'):
+        # The test database stands in for a healthy replica.
+        with mock.patch('erp.db_router.get_healthy_replicas', return_value=['default']):
+            with mock.patch(target, wraps=get_or_compute) as fill:
+                self.assertEqual(self.client.get(url).status_code, 200)
+        return fill.call_args.args[3]
+
+    def test_fills_keep_their_timeout_without_recent_writes(self):
+        self.assertEqual(self.fill_timeout('/api/categories/'), 60)
+
+    def test_fills_after_a_write_expire_with_the_replica_lag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Backend')
+
+        self.assertEqual(self.fill_timeout('/api/categories/'), 5)
+        self.assertEqual(self.fill_timeout('/api/count/', 'erp.views.get_or_compute'), 5)
+
+    def test_writer_sticking_to_the_primary_keeps_the_timeout(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/categories/', {'name': 'Backend'}).status_code, 201)
+
+        self.assertEqual(self.fill_timeout('/api/categories/'), 60)
+
+
+@override_settings(REPLICA_MAX_LAG=5, REPLICA_CHECK_INTERVAL=10)
+class ReplicaHealthTests(SimpleTestCase):
+    def setUp(self):
+        _health.clear()
+
+    def test_lagging_replica_is_dropped(self):
+        with mock.patch('erp.db_router.get_replica_lag', return_value=30), self.assertLogs('erp.db_router', 'WARNING'):
+            self.assertFalse(is_healthy('replica'))
+
+    def test_unreachable_replica_is_dropped_until_next_check(self):
+        lag = mock.Mock(side_effect=OperationalError('could not connect'))
+        with mock.patch('erp.db_router.get_replica_lag', lag), self.assertLogs('erp.db_router', 'WARNING'):
+            self.assertFalse(is_healthy('replica'))
+            self.assertFalse(is_healthy('replica'))
+        lag.assert_called_once()
+
+
+class PoolStatsTests(SimpleTestCase):
+    def test_reports_waits_and_exhaustion(self):
+        pool = mock.Mock(min_size=1, max_size=4)
+        pool.get_stats.return_value = {
+            'pool_size': 4, 'pool_available': 0, 'requests_num': 200, 'requests_queued': 30,
+            'requests_wait_ms': 900, 'requests_errors': 2, 'requests_waiting': 3,
+        }
+
+        stats = get_pool_stats(pool)
+
+        self.assertEqual((stats['waited'], stats['timed_out'], stats['waiting_now']), (30, 2, 3))
+        self.assertEqual(stats['avg_wait_ms'], 4.5)
+
+
+class SparseFieldsTests(GroupTestCase):
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            results = self.client.get(url, params).json()['results']
+        return results, [query['sql'] for query in queries if 'LIMIT' in query['sql']]
+
+    def test_prunes_fields_and_columns(self):
+        results, [sql] = self.get('/api/courses/', {'fields': 'id,category_name'})
+
+        self.assertEqual(list(results[0]), ['id', 'category_name'])
+        self.assertNotIn('description', sql)
+        self.assertNotIn('"erp_category"."slug"', sql)
+
+    def test_nested_fields_only_when_expanded(self):
+        results, _ = self.get('/api/categories/', {'fields': 'id,name'})
+        self.assertEqual(list(results[0]), ['id', 'name'])
+
+        with self.assertNumQueries(5):
+            results, _ = self.get('/api/categories/', {'fields': 'id,name', 'expand': 'courses'})
+        self.assertEqual(results[0]['courses'][0]['name'], 'Django')
+
+
+class ValuesSerializerTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        category = Category.objects.create(name='Backend')
+        course = Course.objects.create(name='Django', description='Web', price='1250.50', category=category)
+        teacher = Teacher.objects.create(first_name='Aziz', last_name='Karimov', phone_number='', password='', username='aziz')
+        group = Group.objects.create(
+            name='N1', course=course, teacher=teacher, started_at='2025-01-01T09:00Z', ended_at='2025-05-01T09:30:15.5Z',
+        )
+        module = Module.objects.create(title='ORM', group=group)
+        Homework.objects.create(overview='Models', file='homework/files/task.pdf', module=module)
+        Student.objects.create(first_name='Ali', last_name='Valiyev', phone_number='', password='', group=group)
+        Student.objects.create(first_name='Laylo', last_name='Yusupova', phone_number='', password='', gender='FEMALE')
+
+    def assertSameAsSerializer(self, url, params=None):
+        cache.clear()
+        fast = self.client.get(url, params)
+        cache.clear()
+        with mock.patch('erp.mixins.compile_values_serializer', return_value=None):
+            slow = self.client.get(url, params)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_output_matches_serializers(self):
+        for url in ['/api/students/', '/api/groups/', '/api/courses/', '/api/teachers/', '/api/modules/', '/api/homeworks/']:
+            with self.subTest(url=url):
+                self.assertSameAsSerializer(url)
+
+    def test_output_matches_with_sparse_fields_and_cursor(self):
+        self.assertSameAsSerializer('/api/courses/', {'fields': 'price,category_name'})
+        self.assertSameAsSerializer('/api/students/', {'cursor': '', 'page_size': 1})
+
+    def test_cursor_ordered_by_a_field_left_out(self):
+        params = {'cursor': '', 'page_size': 1, 'fields': 'id', 'ordering': 'last_name'}
+        self.assertSameAsSerializer('/api/students/', params)
+
+        first = self.client.get('/api/students/', params).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(first['results'][0].keys(), {'id'})
+        self.assertEqual(
+            [first['results'][0]['id'], second['results'][0]['id']],
+            list(Student.objects.order_by('last_name').values_list('pk', flat=True)),
+        )
+
+    def test_falls_back_when_a_field_needs_the_instance(self):
+        request = Request(RequestFactory().get('/api/categories/'))
+        serializer = CategorySerializer(context={'request': request})
+
+        self.assertIsNone(compile_values_serializer(serializer, CategoryApiView.queryset))
+        self.assertIsNotNone(compile_values_serializer(CourseModelSerializer(context={'request': request}), Course.objects.all()))
+
+
+# Recompute in the test's transaction instead of a background thread.
+@mock.patch.object(GroupOverviewApiView, 'cache_latency_budget', None)
+class GroupOverviewTests(GroupTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        teacher = Teacher.objects.create(first_name='Aziz', last_name='Karimov', phone_number='', password='', username='aziz')
+        cls.groups = [cls.group, Group.objects.create(
+            name='N2', course=cls.course, started_at='2025-01-01T09:00Z', ended_at='2025-05-01T09:00Z',
+        )]
+        Group.objects.update(teacher=teacher)
+
+    def add_module(self, group, title):
+        module = Module.objects.create(title=title, group=group)
+        Homework.objects.create(overview=f'{title} task', file='homework/files/task.pdf', module=module)
+        Video.objects.create(title=f'{title} video', file='videos/lesson.mp4', module=module)
+        Student.objects.create(first_name='Ali', last_name=title, phone_number='', password='', group=group)
+        return module
+
+    def get_overview(self, group):
+        return self.client.get(f'/api/groups/{group.pk}/overview/').json()
+
+    def test_queries_do_not_grow_with_the_group(self):
+        small, big = self.groups
+        self.add_module(small, 'ORM')
+        for i in range(5):
+            self.add_module(big, f'Module {i}')
+
+        # Eight ETag aggregates, the group with course and teacher, and four prefetches.
+        for group, modules in ((small, 1), (big, 5)):
+            with self.assertNumQueries(13):
+                overview = self.get_overview(group)
+            self.assertEqual(len(overview['modules']), modules)
+            self.assertEqual(len(overview['students']), modules)
+        self.assertEqual(overview['course']['category_name'], 'Backend')
+        self.assertEqual(overview['modules'][0]['homework'][0]['overview'], 'Module 0 task')
+
+        with self.assertNumQueries(0):
+            self.get_overview(big)
+
+    def test_child_writes_invalidate_only_their_group(self):
+        group, other = self.groups
+        module = self.add_module(group, 'ORM')
+        self.get_overview(group)
+        self.get_overview(other)
+
+        Homework.objects.create(overview='Extra', file='homework/files/task.pdf', module=module)
+        Student.objects.filter(group=group).get().delete()
+
+        overview = self.get_overview(group)
+        self.assertEqual([homework['overview'] for homework in overview['modules'][0]['homework']], ['ORM task', 'Extra'])
+        self.assertEqual(overview['students'], [])
+        with self.assertNumQueries(0):
+            self.get_overview(other)
+
+    def test_moving_a_module_invalidates_both_groups(self):
+        group, other = self.groups
+        module = self.add_module(group, 'ORM')
+        self.get_overview(group)
+        self.get_overview(other)
+
+        module.group = other
+        module.save()
+
+        self.assertEqual(self.get_overview(group)['modules'], [])
+        self.assertEqual([module['title'] for module in self.get_overview(other)['modules']], ['ORM'])
+
+    def test_category_rename_changes_the_etag(self):
+        group, _ = self.groups
+        etag = self.client.get(f'/api/groups/{group.pk}/overview/')['ETag']
+
+        category = Category.objects.get()
+        category.name = 'Web'
+        category.save()
+        response = self.client.get(f'/api/groups/{group.pk}/overview/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['course']['category_name'], 'Web')
+
+    def test_saving_a_group_looks_nothing_up(self):
+        group, _ = self.groups
+        with CaptureQueriesContext(connection) as queries:
+            group.save()
+        self.assertEqual([query['sql'].split()[0] for query in queries], ['UPDATE'])
+
+    def test_cascaded_deletes_do_not_look_up_groups_per_row(self):
+        group, _ = self.groups
+        module = self.add_module(group, 'ORM')
+        Homework.objects.bulk_create(
+            Homework(overview=f'Task {i}', file='homework/files/task.pdf', module=module) for i in range(50)
+        )
+        self.get_overview(group)
+
+        with CaptureQueriesContext(connection) as queries:
+            module.delete()
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        # The homeworks and videos collected for the cascade; uploads are fast-deleted.
+        self.assertEqual(len(selects), 2, selects)
+        self.assertEqual(self.get_overview(group)['modules'], [])
+
+
+class VideoMetadataTests(VideoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = b'\x00' * (3 * 1024 * 1024)
+
+    def test_metadata_is_stored_at_upload(self):
+        video = Video.objects.create(file=SimpleUploadedFile('lesson.mp4', self.content), module=self.module)
+
+        video.refresh_from_db()
+        self.assertEqual(video.size, len(self.content))
+        self.assertEqual(video.checksum, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(video.mime_type, 'video/mp4')
+        self.assertEqual(video.file.read(), self.content)
+
+    def test_list_does_not_touch_storage(self):
+        Video.objects.create(file=SimpleUploadedFile('lesson.mp4', self.content), module=self.module)
+
+        with mock.patch('os.path.getsize', side_effect=AssertionError), \
+                mock.patch('django.core.files.storage.FileSystemStorage.size', side_effect=AssertionError):
+            results = self.client.get('/api/videos/').json()['results']
+        self.assertEqual(results[0]['formatted_size'], '3.00 MB')
+
+    def test_backfill_fills_rows_without_size(self):
+        video = Video.objects.create(file=SimpleUploadedFile('lesson.mp4', self.content), module=self.module)
+        Video.objects.filter(pk=video.pk).update(size=None, checksum='', mime_type='')
+        Video.objects.create(file='videos/gone.mp4', module=self.module)
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command('backfill_video_metadata', stdout=out, stderr=err)
+
+        video.refresh_from_db()
+        self.assertEqual((video.size, video.mime_type), (len(self.content), 'video/mp4'))
+        self.assertIn('1 videos updated, 1 missing', out.getvalue())
+        self.assertIn('gone.mp4', err.getvalue())
+
+
+@override_settings(VIDEO_UPLOAD_CHUNK_SIZE=4)
+class VideoUploadTests(VideoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = b'lecture-video'
+
+    def start(self, **data):
+        response = self.client.post(
+            '/api/videos/uploads/', {'module': self.module.pk, 'filename': 'lecture.mp4', 'size': len(self.content), **data},
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def put_chunk(self, upload_id, offset, chunk):
+        return self.client.put(
+            f'/api/videos/uploads/{upload_id}/', chunk, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def upload_all(self, upload_id):
+        for offset in range(0, len(self.content), 4):
+            self.assertEqual(self.put_chunk(upload_id, offset, self.content[offset:offset + 4]).status_code, 200)
+
+    def test_video_is_ready_only_after_completion(self):
+        upload_id = self.start(checksum=hashlib.sha256(self.content).hexdigest())
+        video = VideoUpload.objects.get(pk=upload_id).video
+        self.upload_all(upload_id)
+        video.refresh_from_db()
+        self.assertEqual(video.status, Video.StatusChoice.UPLOADING)
+
+        response = self.client.post(f'/api/videos/uploads/{upload_id}/complete/')
+
+        self.assertEqual(response.json()['status'], 'ready')
+        video.refresh_from_db()
+        self.assertEqual(video.file.read(), self.content)
+        self.assertEqual((video.size, video.mime_type), (len(self.content), 'video/mp4'))
+        self.assertFalse(VideoUpload.objects.exists())
+
+    def test_resumes_from_the_stored_offset(self):
+        upload_id = self.start()
+        self.put_chunk(upload_id, 0, self.content[:4])
+
+        response = self.put_chunk(upload_id, 8, self.content[8:12])
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 4))
+        self.assertEqual(self.client.get(f'/api/videos/uploads/{upload_id}/').json()['offset'], 4)
+        self.assertEqual(self.put_chunk(upload_id, 0, self.content[:4]).status_code, 409)
+        self.assertEqual(self.client.post(f'/api/videos/uploads/{upload_id}/complete/').status_code, 409)
+
+    def test_checksum_mismatch_restarts_the_upload(self):
+        upload_id = self.start(checksum='0' * 64)
+        self.upload_all(upload_id)
+
+        response = self.client.post(f'/api/videos/uploads/{upload_id}/complete/')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(VideoUpload.objects.get(pk=upload_id).offset, 0)
+        self.assertEqual(VideoUpload.objects.get(pk=upload_id).video.status, Video.StatusChoice.UPLOADING)
+
+    def test_chunks_are_stored_outside_the_transaction(self):
+        upload = VideoUpload.objects.get(pk=self.start())
+        depth = len(connection.savepoint_ids)
+        test = self
+
+        class Body(io.BytesIO):
+            def read(self, size=-1):
+                test.assertEqual(len(connection.savepoint_ids), depth)
+                return super().read(size)
+
+        self.assertEqual(write_chunk(upload, 0, Body(self.content[:4]), 4), 4)
+        upload.refresh_from_db()
+        self.assertEqual(len(upload.parts), 1)
+
+    def test_assembly_runs_outside_the_transaction(self):
+        upload_id = self.start()
+        self.upload_all(upload_id)
+        complete_url = f'/api/videos/uploads/{upload_id}/complete/'
+        depth = len(connection.savepoint_ids)
+
+        def probe(path):
+            self.assertEqual(len(connection.savepoint_ids), depth)
+            self.assertEqual(VideoUpload.objects.get(pk=upload_id).status, VideoUpload.StatusChoice.ASSEMBLING)
+            self.assertEqual(self.client.post(complete_url).status_code, 409)
+            self.assertEqual(self.put_chunk(upload_id, len(self.content), b'x').status_code, 409)
+            return {'duration': 1.5}
+
+        with mock.patch('erp.uploads.probe_video', probe):
+            response = self.client.post(complete_url)
+
+        self.assertEqual((response.json()['status'], response.json()['duration']), ('ready', 1.5))
+
+    def test_failed_assembly_can_be_retried(self):
+        upload_id = self.start()
+        self.upload_all(upload_id)
+
+        with mock.patch('erp.uploads.probe_video', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.client.post(f'/api/videos/uploads/{upload_id}/complete/')
+        self.assertEqual(VideoUpload.objects.get(pk=upload_id).status, VideoUpload.StatusChoice.UPLOADING)
+
+        self.assertEqual(self.client.post(f'/api/videos/uploads/{upload_id}/complete/').json()['status'], 'ready')
+
+    def test_single_request_upload_is_ready_after_one_save(self):
+        with CaptureQueriesContext(connection) as queries:
+            video = Video.objects.create(file=SimpleUploadedFile('lesson.mp4', self.content), module=self.module)
+
+        self.assertEqual(video.status, Video.StatusChoice.READY)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "erp_video"')]), 0)
+
+
+@override_settings(VIDEO_ACCEL_REDIRECT=False)
+class VideoStreamTests(VideoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = bytes(range(256)) * 1024
+        self.video = Video.objects.create(file=SimpleUploadedFile('lesson.mp4', self.content), module=self.module)
+        self.url = f'/api/videos/{self.video.pk}/stream/'
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def test_whole_file_without_range(self):
+        response, content = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response['Content-Type'], response['Accept-Ranges']), ('video/mp4', 'bytes'))
+        self.assertEqual(content, self.content)
+
+    def test_byte_ranges(self):
+        size = len(self.content)
+        for header, start, end in [('bytes=100-199', 100, 199), ('bytes=-10', size - 10, size - 1), (f'bytes={size - 5}-', size - 5, size - 1)]:
+            with self.subTest(header=header):
+                response, content = self.get(Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+                self.assertEqual(content, self.content[start:end + 1])
+
+        response, _ = self.get(Range=f'bytes={size}-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{size}'))
+        self.assertEqual(self.get(Range='bytes=0-1', **{'If-Range': '"outdated"'})[0].status_code, 200)
+
+    @override_settings(VIDEO_ACCEL_REDIRECT=True)
+    def test_hands_the_transfer_to_nginx(self):
+        response, content = self.get(Range='bytes=0-1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.video.file.name}')
+        self.assertEqual(content, b'')
+
+    def test_only_ready_videos_for_authenticated_users(self):
+        Video.objects.filter(pk=self.video.pk).update(status=Video.StatusChoice.UPLOADING)
+        self.assertEqual(self.get()[0].status_code, 404)
+
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get(self.url).status_code, (401, 403))
@@ -0,0 +1,243 @@
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .media import get_local_path, get_mime_type, probe_video
+from .models import Video, VideoUpload
+
+PARTS_DIR = 'uploads/videos/{}'
+# After this many seconds an assembly is taken to have died with its worker and may be retried.
+ASSEMBLY_TIMEOUT = 60 * 60
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadBusy(UploadError):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, offset):
+        super().__init__(f'The upload is at offset {offset}')
+        self.offset = offset
+
+
+class ChunkReader:
+    """Reads at most limit bytes of a request body, counting them."""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.remaining = limit
+        self.size = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.stream.read(size) if size else b''
+        self.remaining -= len(data)
+        self.size += len(data)
+        return data
+
+
+class PartsReader:
+    """Reads stored parts back to back as one file, hashing everything that passes through."""
+
+    def __init__(self, storage, names):
+        self.storage = storage
+        self.names = list(names)
+        self.current = None
+        self.checksum = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        while True:
+            if self.current is None:
+                if not self.names:
+                    return b''
+                self.current = self.storage.open(self.names.pop(0), 'rb')
+            data = self.current.read(size)
+            if data:
+                self.checksum.update(data)
+                self.size += len(data)
+                return data
+            self.current.close()
+            self.current = None
+
+
+def get_storage():
+    return Video._meta.get_field('file').storage
+
+
+def delete_parts(storage, upload_pk, names=None):
+    """Delete the given parts, or everything stored for the upload, chunks that lost a race included."""
+    directory = PARTS_DIR.format(upload_pk)
+    if names is None:
+        try:
+            _, files = storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        names = [f'{directory}/{name}' for name in files]
+    for name in names:
+        storage.delete(name)
+    try:
+        storage.delete(directory)
+    except OSError:
+        # Not empty: the upload went on with new parts.
+        pass
+
+
+def start_upload(module, filename, size, title='', checksum=''):
+    """Create the video, UPLOADING and without a file yet, and the upload that will fill it."""
+    filename = os.path.basename(filename)
+    with transaction.atomic():
+        video = Video.objects.create(module=module, title=title or filename)
+        upload = VideoUpload.objects.create(video=video, filename=filename, size=size, checksum=checksum.lower())
+    return upload
+
+
+def check_chunk(upload, offset, length):
+    if upload.status != VideoUpload.StatusChoice.UPLOADING:
+        raise UploadBusy('The upload is being assembled')
+    if offset != upload.offset:
+        raise OffsetMismatch(upload.offset)
+    limit = min(settings.VIDEO_UPLOAD_CHUNK_SIZE, upload.size - upload.offset)
+    if not 0 < length <= limit:
+        raise UploadError(f'A chunk has to be between 1 and {limit} bytes')
+
+
+def lock_upload(upload, **filters):
+    try:
+        return VideoUpload.objects.select_for_update(of=('self',)).select_related('video').get(pk=upload.pk, **filters)
+    except VideoUpload.DoesNotExist:
+        raise UploadError('The upload was cancelled')
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Store length bytes of stream as the part starting at offset, which has to
+    be where the upload currently ends, and return the new offset. The chunk
+    goes straight from the request to storage in small reads, under a name of
+    its own and outside any transaction; the upload row is only locked to
+    count it afterwards. Of a retried chunk racing the original, the one that
+    comes second is refused there and deleted instead of being stored twice.
+    """
+    storage = get_storage()
+    check_chunk(upload, offset, length)
+    name = f'{PARTS_DIR.format(upload.pk)}/{offset:015d}-{uuid.uuid4().hex}'
+    reader = ChunkReader(stream, length)
+    name = storage.save(name, File(reader, name=name))
+    try:
+        if reader.size != length:
+            raise UploadError(f'The chunk ended after {reader.size} of {length} bytes')
+        with transaction.atomic():
+            upload = lock_upload(upload)
+            check_chunk(upload, offset, length)
+            upload.offset += length
+            upload.parts.append(name)
+            upload.save(update_fields=['offset', 'parts'])
+    except UploadError:
+        storage.delete(name)
+        raise
+    return upload.offset
+
+
+def claim_assembly(upload):
+    """Mark the upload ASSEMBLING, unless another request is on it and has not timed out."""
+    now = timezone.now()
+    with transaction.atomic():
+        upload = lock_upload(upload)
+        if upload.offset != upload.size:
+            raise OffsetMismatch(upload.offset)
+        if upload.status == VideoUpload.StatusChoice.ASSEMBLING:
+            if upload.assembly_started_at > now - timedelta(seconds=ASSEMBLY_TIMEOUT):
+                raise UploadBusy('The upload is already being assembled')
+        upload.status = VideoUpload.StatusChoice.ASSEMBLING
+        upload.assembly_started_at = now
+        upload.save(update_fields=['status', 'assembly_started_at'])
+    return upload
+
+
+def release_assembly(upload):
+    """Let a failed assembly be retried, unless another request has claimed it since."""
+    VideoUpload.objects.filter(pk=upload.pk, assembly_started_at=upload.assembly_started_at).update(
+        status=VideoUpload.StatusChoice.UPLOADING, assembly_started_at=None,
+    )
+
+
+def finish_assembly(claimed, name, reader, metadata):
+    storage = get_storage()
+    checksum = reader.checksum.hexdigest()
+    with transaction.atomic():
+        upload = lock_upload(
+            claimed, status=VideoUpload.StatusChoice.ASSEMBLING, assembly_started_at=claimed.assembly_started_at,
+        )
+        if upload.checksum and upload.checksum != checksum:
+            transaction.on_commit(partial(delete_parts, storage, upload.pk, upload.parts))
+            upload.offset = 0
+            upload.parts = []
+            upload.status = VideoUpload.StatusChoice.UPLOADING
+            upload.assembly_started_at = None
+            upload.save(update_fields=['offset', 'parts', 'status', 'assembly_started_at'])
+            return None
+
+        transaction.on_commit(partial(delete_parts, storage, upload.pk))
+        video = upload.video
+        video.file.name = name
+        video.size = reader.size
+        video.checksum = checksum
+        video.mime_type = get_mime_type(upload.filename)
+        for field, value in metadata.items():
+            setattr(video, field, value)
+        video.status = Video.StatusChoice.READY
+        video.save()
+        upload.delete()
+    return video
+
+
+def complete_upload(upload):
+    """
+    Assemble the parts into the video's file in one streaming pass, which also
+    yields its size and checksum, and mark the video READY. The upload row is
+    locked twice and briefly: to mark it ASSEMBLING, which turns away chunks
+    and other completions, and to finish. Copying, hashing and probing run in
+    between, outside any transaction. On a checksum mismatch the parts are
+    dropped and the upload starts over from offset 0.
+    """
+    storage = get_storage()
+    upload = claim_assembly(upload)
+    video, name = upload.video, None
+    try:
+        reader = PartsReader(storage, upload.parts)
+        name = storage.save(video.file.field.generate_filename(video, upload.filename), File(reader))
+        checksum = reader.checksum.hexdigest()
+        video.file.name = name
+        mismatch = upload.checksum and upload.checksum != checksum
+        metadata = {} if mismatch else probe_video(get_local_path(video.file))
+        video = finish_assembly(upload, name, reader, metadata)
+    except Exception:
+        if name is not None:
+            storage.delete(name)
+        release_assembly(upload)
+        raise
+
+    if video is None:
+        storage.delete(name)
+        raise UploadError(f'Checksum mismatch, got {checksum}; upload the file again from offset 0')
+    return video
+
+
+def abort_upload(upload):
+    storage = get_storage()
+    with transaction.atomic():
+        upload = lock_upload(upload)
+        transaction.on_commit(partial(delete_parts, storage, upload.pk))
+        upload.video.delete()
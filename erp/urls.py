@@ -18,6 +18,7 @@ urlpatterns = [
     # Group URLs
     path('groups/', GroupApiView.as_view(), name='group-list'),
     path('groups/<int:pk>/', GroupApiView.as_view(), name='group-detail'),
+    path('groups/<int:pk>/overview/', GroupOverviewApiView.as_view(), name='group-overview'),
 
     # Module URLs
     path('modules/', ModuleApiView.as_view(), name='module-list'),
@@ -31,11 +32,25 @@ urlpatterns = [
     # Video URLs
     path('videos/', VideoApiView.as_view(), name='video-list'),
     path('videos/<int:pk>/',VideoApiView.as_view(), name='video-detail'),
+    path('videos/<int:pk>/stream/', VideoStreamApiView.as_view(), name='video-stream'),
+    path('videos/uploads/', VideoUploadApiView.as_view(), name='video-upload-list'),
+    path('videos/uploads/<int:pk>/', VideoUploadApiView.as_view(), name='video-upload-detail'),
+    path('videos/uploads/<int:pk>/complete/', VideoUploadCompleteApiView.as_view(), name='video-upload-complete'),
 
     # Student URLs
     path('students/', StudentApiView.as_view(), name='student-list'),
     path('students/<int:pk>/', StudentApiView.as_view(), name='student-detail'),
+    path('students/bulk/', StudentBulkApiView.as_view(), name='student-bulk'),
 
     # Count URLs
     path('count/', CountApiView.as_view(), name='count-list'),
+
+    # Export URLs
+    path('export/<str:resource>/<str:file_format>/', ExportApiView.as_view(), name='export'),
+
+    # Cache URLs
+    path('cache-stats/', CacheStatsApiView.as_view(), name='cache-stats'),
+
+    # Database URLs
+    path('db-stats/', DatabaseStatsApiView.as_view(), name='db-stats'),
 ]
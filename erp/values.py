@@ -0,0 +1,133 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import FileField
+from rest_framework import relations, serializers
+from rest_framework.fields import empty
+
+# to_representation implementations that are nothing but a builtin call.
+BUILTIN_MAPPERS = {
+    serializers.CharField.to_representation: str,
+    serializers.IntegerField.to_representation: int,
+}
+
+
+class Unsupported(Exception):
+    pass
+
+
+class ValuesSerializer:
+    """
+    Renders rows of queryset.values(*columns) exactly like the serializer it
+    was compiled from renders model instances, without building either: every
+    field is reduced to a column and a mapper once, up front.
+    """
+
+    def __init__(self, columns, to_representation):
+        self.columns = columns
+        self.to_representation = to_representation
+
+    def serialize(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
+def compile_values_serializer(serializer, queryset):
+    """
+    A ValuesSerializer for a ModelSerializer, or None when some field needs a
+    model instance (method fields, properties, annotations, reverse or
+    many-to-many relations, nested lists).
+    """
+    if queryset.query.annotation_select:
+        return None
+    try:
+        columns, to_representation = compile_fields(serializer, queryset.model._meta, '')
+    except Unsupported:
+        return None
+    # CursorPagination reads the position from row['pk'].
+    return ValuesSerializer(['pk', *columns], to_representation)
+
+
+def compile_fields(serializer, opts, prefix):
+    columns, entries = [], []
+    for field in serializer._readable_fields:
+        if field.source == '*':
+            raise Unsupported
+        if is_always_skipped(field, opts):
+            continue
+
+        model_field, path = resolve(opts, field.source_attrs)
+        column = prefix + '__'.join(path)
+        if isinstance(field, serializers.BaseSerializer):
+            if isinstance(field, serializers.ListSerializer) or not model_field.many_to_one:
+                raise Unsupported
+            nested_columns, mapper = compile_fields(field, model_field.related_model._meta, f'{column}__')
+            columns += [column, *nested_columns]
+            entries.append((field.field_name, column, mapper, True))
+            continue
+
+        if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+            if not model_field.many_to_one:
+                raise Unsupported
+            # values() already returns the foreign key id.
+            mapper = None
+        elif isinstance(field, serializers.RelatedField) or model_field.is_relation:
+            raise Unsupported
+        elif isinstance(field, serializers.FileField) and isinstance(model_field, FileField):
+            mapper = get_file_mapper(field, model_field)
+        elif isinstance(model_field, FileField):
+            raise Unsupported
+        else:
+            mapper = BUILTIN_MAPPERS.get(type(field).to_representation, field.to_representation)
+        columns.append(column)
+        entries.append((field.field_name, column, mapper, False))
+    return columns, compile_row(entries)
+
+
+def is_always_skipped(field, opts):
+    # DRF drops a read-only field whose source the model does not have at all
+    # (StudentSerializer.group_name) instead of failing, on every row.
+    if hasattr(opts.model, field.source_attrs[0]):
+        return False
+    return field.default is empty and not field.allow_null and not field.required
+
+
+def resolve(opts, attrs):
+    """The model field behind a source path and its values() lookup path."""
+    for index, attr in enumerate(attrs):
+        try:
+            model_field = opts.get_field(attr)
+        except FieldDoesNotExist:
+            # Properties and methods are only available on instances.
+            raise Unsupported
+        if not model_field.concrete or model_field.many_to_many:
+            raise Unsupported
+        if index < len(attrs) - 1:
+            # Through a null foreign key DRF skips the key, values() gives None.
+            if not model_field.many_to_one or model_field.null:
+                raise Unsupported
+            opts = model_field.related_model._meta
+    return model_field, attrs
+
+
+def get_file_mapper(field, model_field):
+    to_representation = field.to_representation
+
+    def mapper(name):
+        return to_representation(model_field.attr_class(None, model_field, name))
+    return mapper
+
+
+def compile_row(entries):
+    entries = tuple(entries)
+
+    def to_representation(row):
+        ret = {}
+        for key, column, mapper, nested in entries:
+            value = row[column]
+            if value is not None:
+                if nested:
+                    value = mapper(row)
+                elif mapper is not None:
+                    value = mapper(value)
+            ret[key] = value
+        return ret
+    return to_representation
@@ -1,58 +1,54 @@
+from django.conf import settings
 from django.core.cache import cache
-from django.http import FileResponse
+from django.db.models import Count, Prefetch
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.utils.cache import patch_cache_control
 from rest_framework import filters
 from rest_framework import status
 from rest_framework.generics import GenericAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from erp.serializers import *
+from .cache import get_affected_namespaces, get_namespace, get_or_compute
+from .counters import COUNTED_MODELS, get_counts
+from .db_router import limit_to_replica_lag
+from .db_stats import get_database_stats
+from .enrollment import InvalidFile, enroll_students, read_csv
+from .exports import CONTENT_TYPES, export_rows, get_export_queryset
+from .mixins import CachedResponseMixin, SparseFieldsMixin, ValuesListMixin
 from .permissions import IsWithInWorkingHours, WeekdayOnly
+from .search import SearchFilter
+from .streaming import get_accel_response, get_range_response
+from .uploads import (
+    OffsetMismatch, UploadBusy, UploadError, abort_upload, complete_upload, start_upload, write_chunk,
+)
 
 
-@method_decorator(cache_page(60), name='get')
-class CategoryApiView(GenericAPIView):
+class CategoryApiView(SparseFieldsMixin, CachedResponseMixin, GenericAPIView):
     serializer_class = CategorySerializer
-    queryset = Category.objects.all()
+    # Prefetched courses get their category set from the parent row, so
+    # category_name costs no extra query either.
+    queryset = Category.objects.annotate(course_count=Count('courses')).prefetch_related('courses')
     permission_classes = [IsAuthenticated, IsWithInWorkingHours, WeekdayOnly]
     # authentication_classes = [BasicAuthentication, TokenAuthentication]
     lookup_field = 'pk'
-    filter_backends = (filters.SearchFilter, filters.OrderingFilter)
+    filter_backends = (SearchFilter, filters.OrderingFilter)
     search_fields = ['name']
     ordering_fields = ['name']
+    conditional_related_models = (Course,)
 
     def get(self, request, pk=None):
         if pk:
-            category = get_object_or_404(Category, pk=pk)
-            serializer = self.get_serializer(category)
-            return Response(serializer.data)
-
-        cache_key = f"course_list_user{request.user.id}_cat{request.GET.get('category', 'all')}"
-        cache_data = cache.get(cache_key)
-        if cache_data:
-            return Response(cache_data)
-
-        categories = self.get_queryset()
-        page = self.paginate_queryset(categories)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            response = self.get_paginated_response(serializer.data)
-            cache.set(cache_key, response.data, 60)
-            return response
-
-        serializer = self.get_serializer(categories, many=True)
-        cache.set(cache_key, serializer.data, 60)
-        return Response(serializer.data)
+            return self.retrieve(request, pk)
+        return self.list(request)
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        cache.clear()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def put(self, request, pk):
@@ -60,25 +56,23 @@ class CategoryApiView(GenericAPIView):
         serializer = self.get_serializer(category, data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        cache.clear()
         return Response(serializer.data)
 
     def delete(self, request, pk):
         category = get_object_or_404(Category, pk=pk)
         category.delete()
-        cache.clear()
         return Response({'message': 'Category deleted'}, status=status.HTTP_204_NO_CONTENT)
 
 
-@method_decorator(cache_page(60), name='get')
-class CourseApiView(GenericAPIView):
+class CourseApiView(SparseFieldsMixin, ValuesListMixin, CachedResponseMixin, GenericAPIView):
     serializer_class = CourseModelSerializer
-    queryset = Course.objects.select_related('course').all()
+    queryset = Course.objects.select_related('category').all()
     permission_classes = [IsAuthenticated, IsWithInWorkingHours, WeekdayOnly]
     lookup_field = 'pk'
-    filter_backends = (filters.SearchFilter, filters.OrderingFilter)
+    filter_backends = (SearchFilter, filters.OrderingFilter)
     search_fields = ['name']
     ordering_fields = ['name']
+    conditional_related_models = (Category,)
 
     def get_queryset(self):
         category = self.request.query_params.get('category')
@@ -87,33 +81,13 @@ class CourseApiView(GenericAPIView):
 
     def get(self, request, pk=None):
         if pk:
-            course = get_object_or_404(Course, pk=pk)
-            serializer = self.get_serializer(course)
-            return Response(serializer.data)
-
-        cache_key = f"course_list_user{request.user.id}_cat{request.GET.get('category', 'all')}"
-        cache_data = cache.get(cache_key)
-        if cache_data:
-            return Response(cache_data, status=status.HTTP_200_OK)
-
-        queryset = self.get_queryset()
-        paginated_queryset = self.paginate_queryset(queryset)
-        if paginated_queryset is not None:
-            serializer = self.get_serializer(paginated_queryset, many=True)
-            response = self.get_paginated_response(serializer.data)
-            cache.set(cache_key, response.data, 60)
-            return response
-
-        serializer = self.get_serializer(queryset, many=True)
-        cache.set(cache_key, serializer.data, 60)
-        return Response(serializer.data)
+            return self.retrieve(request, pk)
+        return self.list(request)
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-
-        cache.clear()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def put(self, request, pk):
@@ -121,53 +95,33 @@ class CourseApiView(GenericAPIView):
         serializer = self.get_serializer(course, data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        cache.clear()
         return Response(serializer.data)
 
     def delete(self, request, pk):
         course = get_object_or_404(Course, pk=pk)
         course.delete()
-        cache.clear()
         return Response({'message': 'Course deleted'}, status=status.HTTP_204_NO_CONTENT)
 
 
 
 
-class TeacherApiView(GenericAPIView):
+class TeacherApiView(SparseFieldsMixin, ValuesListMixin, CachedResponseMixin, GenericAPIView):
     serializer_class = TeacherSerializer
     queryset = Teacher.objects.all()
     permission_classes = [IsAuthenticated, IsWithInWorkingHours, WeekdayOnly]
     lookup_field = 'pk'
-    filter_backends = (filters.SearchFilter, filters.OrderingFilter)
+    filter_backends = (SearchFilter, filters.OrderingFilter)
+    search_fields = ['first_name', 'last_name', 'username', 'phone_number']
 
     def get(self, request, pk=None):
         if pk:
-            teacher = get_object_or_404(Teacher, pk=pk)
-            serializer = self.get_serializer(teacher)
-            return Response(serializer.data)
-
-        cache_key = f'teacher_list_{request.GET.get("teacher", "all")}'
-        cache_data = cache.get(cache_key)
-        if cache_data:
-            return Response(cache_data, status=status.HTTP_200_OK)
-
-        teachers = self.get_queryset()
-        paginated_queryset = self.paginate_queryset(teachers)
-        if paginated_queryset is not None:
-            serializer = self.get_serializer(paginated_queryset, many=True)
-            response = self.get_paginated_response(serializer.data)
-            cache.set(cache_key, response.data, 60)
-            return response
-
-        serializer = self.get_serializer(teachers, many=True)
-        cache.set(cache_key, serializer.data, 60)
-        return Response(serializer.data)
+            return self.retrieve(request, pk)
+        return self.list(request)
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        cache.clear()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def put(self, request, pk):
@@ -175,50 +129,37 @@ class TeacherApiView(GenericAPIView):
         serializer = self.get_serializer(teacher, data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        cache.clear()
         return Response(serializer.data)
 
     def delete(self, request, pk):
         teacher = get_object_or_404(Teacher, pk=pk)
         teacher.delete()
-        cache.clear()
         return Response({'message': 'Teacher deleted'}, status=status.HTTP_204_NO_CONTENT)
 
 
 
 
-class GroupApiView(GenericAPIView):
+class GroupApiView(SparseFieldsMixin, ValuesListMixin, CachedResponseMixin, GenericAPIView):
     serializer_class = GroupSerializer
     queryset = Group.objects.all()
     permission_classes = [IsAuthenticated, IsWithInWorkingHours, WeekdayOnly]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        group_status = self.request.query_params.get('status')
+        if group_status:
+            queryset = queryset.filter(status=group_status)
+        return queryset
+
     def get(self, request, pk=None):
         if pk:
-            group = get_object_or_404(Group, pk=pk)
-            serializer = self.get_serializer(group)
-            return Response(serializer.data)
-        cache_key = f'group_list_{request.GET.get("group", "all")}'
-        cache_data = cache.get(cache_key)
-        if cache_data:
-            return Response(cache_data, status=status.HTTP_200_OK)
-
-        groups = self.get_queryset()
-        paginated_queryset = self.paginate_queryset(groups)
-        if paginated_queryset is not None:
-            serializer = self.get_serializer(groups, many=True)
-            response = self.get_paginated_response(serializer.data)
-            cache.set(cache_key, response.data, 60)
-            return response
-
-        serializer = self.get_serializer(groups, many=True)
-        cache.set(cache_key, serializer.data, 60)
-        return Response(serializer.data)
+            return self.retrieve(request, pk)
+        return self.list(request)
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        cache.clear()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def put(self, request, pk):
@@ -226,62 +167,85 @@ class GroupApiView(GenericAPIView):
         serializer = self.get_serializer(group, data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        cache.clear()
         return Response(serializer.data)
 
     def delete(self, request, pk):
         group = get_object_or_404(Group, pk=pk)
         group.delete()
-        cache.clear()
         return Response({'message': 'Group deleted'}, status=status.HTTP_204_NO_CONTENT)
 
 
 
 
-class ModuleApiView(GenericAPIView):
+class GroupOverviewApiView(CachedResponseMixin, GenericAPIView):
+    """
+    Everything the group screen shows in one request: the group with its
+    course, teacher and students, and its modules with their homework and
+    videos. Served with a fixed five queries however big the group is, and
+    cached until the group or one of its students, modules, homework or videos
+    is written (tagged group:<pk>, see erp.signals), or a course, category or
+    teacher changes.
+    """
+    serializer_class = GroupOverviewSerializer
+    queryset = Group.objects.select_related('course__category', 'teacher').prefetch_related(
+        'students',
+        Prefetch('modules', queryset=Module.objects.order_by('date_passed', 'pk').prefetch_related('homework', 'videos')),
+    )
+    permission_classes = [IsAuthenticated, IsWithInWorkingHours, WeekdayOnly]
+    lookup_field = 'pk'
+
+    def get_cache_tags(self):
+        return [f'group:{self.kwargs["pk"]}', *sorted(get_affected_namespaces(Course, Teacher))]
+
+    def get_validator_querysets(self, queryset):
+        return [
+            queryset,
+            Course.objects.filter(groups__in=queryset),
+            # The nested course shows category_name.
+            Category.objects.filter(courses__groups__in=queryset),
+            Teacher.objects.filter(groups__in=queryset),
+            Student.objects.filter(group__in=queryset),
+            Module.objects.filter(group__in=queryset),
+            Homework.objects.filter(module__group__in=queryset),
+            Video.objects.filter(module__group__in=queryset),
+        ]
+
+    def get(self, request, pk):
+        return self.retrieve(request, pk)
+
+
+class ModuleApiView(SparseFieldsMixin, ValuesListMixin, CachedResponseMixin, GenericAPIView):
     serializer_class = ModuleSerializer
     queryset = Module.objects.all()
     permission_classes = [IsAuthenticated, IsWithInWorkingHours, WeekdayOnly]
     lookup_field = 'pk'
+    filter_backends = (filters.OrderingFilter,)
+    ordering_fields = ['date_passed']
 
     def get_queryset(self):
         queryset = super().get_queryset()
         course_id = self.request.query_params.get('course_id')
         if course_id:
-            queryset = queryset.filter(course__id=course_id)
+            queryset = queryset.filter(group__course_id=course_id)
+        group_id = self.request.query_params.get('group_id')
+        if group_id:
+            queryset = queryset.filter(group_id=group_id)
         return queryset
 
     def get(self, request, pk=None):
         if pk:
-            module = get_object_or_404(Module, pk=pk)
-            serializer = self.get_serializer(module)
-            return Response(serializer.data)
-
-        cache_key = f'module_list_{request.GET.get("module", "all")}'
-        cache_data = cache.get(cache_key)
-        if cache_data:
-            return Response(cache_data, status=status.HTTP_200_OK)
-
-
-        modules = self.get_queryset()
-        paginated_queryset = self.paginate_queryset(modules)
-        if paginated_queryset is not None:
-            serializer = self.get_serializer(modules, many=True)
-            response = self.get_paginated_response(serializer.data)
-            cache.set(cache_key, response.data, 60)
-            return response
-
-        serializer = self.get_serializer(modules, many=True)
-        cache.set(cache_key, serializer.data, 60)
-        return Response(serializer.data)
+            return self.retrieve(request, pk)
+        return self.list(request)
 
 
 
-class HomeworkApiView(GenericAPIView):
+class HomeworkApiView(SparseFieldsMixin, ValuesListMixin, CachedResponseMixin, GenericAPIView):
     serializer_class = HomeworkSerializer
     queryset = Homework.objects.all()
     permission_classes = [IsAuthenticated]
     lookup_field = 'pk'
+    filter_backends = (filters.OrderingFilter,)
+    ordering_fields = ['deadline']
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -292,26 +256,8 @@ class HomeworkApiView(GenericAPIView):
 
     def get(self, request, pk=None):
         if pk:
-            homework = get_object_or_404(Homework, pk=pk)
-            serializer = self.get_serializer(homework)
-            return Response(serializer.data)
-
-        module_id = request.GET.get('module_id', 'all')
-        cache_key = f'homework_list_{module_id}'
-        cache_data = cache.get(cache_key)
-        if cache_data:
-            return Response(cache_data, status=status.HTTP_200_OK)
-
-        homeworks = self.get_queryset()
-        paginated_queryset = self.paginate_queryset(homeworks)
-        if paginated_queryset is not None:
-            serializer = self.get_serializer(paginated_queryset, many=True)
-            cache.set(cache_key, serializer.data, 60)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(homeworks, many=True)
-        cache.set(cache_key, serializer.data, 60)
-        return Response(serializer.data)
+            return self.retrieve(request, pk)
+        return self.list(request)
 
 
 class HomeworkDownloadApiView(APIView):
@@ -326,71 +272,131 @@ class HomeworkDownloadApiView(APIView):
 
 
 
-class VideoApiView(GenericAPIView):
+class VideoApiView(SparseFieldsMixin, CachedResponseMixin, GenericAPIView):
     serializer_class = VideoSerializer
     queryset = Video.objects.all()
     permission_classes = [IsAuthenticated]
     lookup_field = 'pk'
+    filter_backends = (filters.OrderingFilter,)
+    ordering_fields = ['created_at']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        module_id = self.request.query_params.get('module_id')
+        if module_id:
+            queryset = queryset.filter(module_id=module_id)
+        video_status = self.request.query_params.get('status')
+        if video_status:
+            queryset = queryset.filter(status=video_status)
+        return queryset
 
     def get(self, request, pk=None):
         if pk:
-            video = get_object_or_404(Video, pk=pk)
-            serializer = self.get_serializer(video)
-            return Response(serializer.data)
-        cache_key = f'video_list_{request.GET.get("video", "all")}'
-        cache_data = cache.get(cache_key)
-        if cache_data:
-            return Response(cache_data, status=status.HTTP_200_OK)
-
-        videos = self.get_queryset()
-        paginated_queryset = self.paginate_queryset(videos)
-        if paginated_queryset is not None:
-            serializer = self.get_serializer(paginated_queryset, many=True)
-            response = self.get_paginated_response(serializer.data)
-            cache.set(cache_key, serializer.data, 60)
-            return response
-
-        serializer = self.get_serializer(videos, many=True)
-        cache.set(cache_key, serializer.data, 60)
-        return Response(serializer.data)
+            return self.retrieve(request, pk)
+        return self.list(request)
+
 
 
+class VideoStreamApiView(APIView):
+    """
+    Stream a ready video to an authenticated user, with Range support for
+    seeking. Behind nginx the transfer is handed off with X-Accel-Redirect, so
+    no worker is held for it; otherwise Django serves the ranges (erp.streaming).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Players ask for video/*; errors are still rendered as JSON.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, pk):
+        video = get_object_or_404(Video, pk=pk, status=Video.StatusChoice.READY)
+        if settings.VIDEO_ACCEL_REDIRECT:
+            response = get_accel_response(video)
+        else:
+            response = get_range_response(request, video)
+        patch_cache_control(response, private=True)
+        return response
 
-class StudentApiView(GenericAPIView):
+
+class VideoUploadApiView(APIView):
+    """
+    Chunked, resumable video uploads (see erp.uploads). POST starts one with
+    module, filename, size and optionally title and a SHA-256 checksum. Each
+    chunk is PUT as the raw request body with an Upload-Offset header equal to
+    the current offset, which GET returns to resume from. DELETE abandons the
+    upload together with its video.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        upload = get_object_or_404(VideoUpload, pk=pk)
+        return Response(VideoUploadSerializer(upload).data)
+
+    def post(self, request):
+        serializer = VideoUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = start_upload(**serializer.validated_data)
+        return Response(VideoUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+    def put(self, request, pk):
+        upload = get_object_or_404(VideoUpload, pk=pk)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response({'detail': 'Send the chunk offset in the Upload-Offset header.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            offset = write_chunk(upload, offset, request.stream, length)
+        except OffsetMismatch as exc:
+            return Response({'detail': str(exc), 'offset': exc.offset}, status=status.HTTP_409_CONFLICT)
+        except UploadBusy as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        except UploadError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'offset': offset}, headers={'Upload-Offset': str(offset)})
+
+    def delete(self, request, pk):
+        abort_upload(get_object_or_404(VideoUpload, pk=pk))
+        return Response({'message': 'Upload cancelled'}, status=status.HTTP_204_NO_CONTENT)
+
+
+class VideoUploadCompleteApiView(APIView):
+    """Assemble an upload whose chunks have all arrived; the video becomes READY."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        upload = get_object_or_404(VideoUpload, pk=pk)
+        try:
+            video = complete_upload(upload)
+        except OffsetMismatch as exc:
+            return Response({'detail': str(exc), 'offset': exc.offset}, status=status.HTTP_409_CONFLICT)
+        except UploadBusy as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        except UploadError as exc:
+            return Response({'detail': str(exc), 'offset': 0}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(VideoSerializer(video, context={'request': request}).data)
+
+
+class StudentApiView(SparseFieldsMixin, ValuesListMixin, CachedResponseMixin, GenericAPIView):
     serializer_class = StudentSerializer
     queryset = Student.objects.select_related('group').all()
     permission_classes = [IsAuthenticated, IsWithInWorkingHours, WeekdayOnly]
     lookup_field = 'pk'
+    filter_backends = (SearchFilter, filters.OrderingFilter)
+    search_fields = ['first_name', 'last_name', 'phone_number', 'student_code']
+    ordering_fields = ['last_name', 'first_name']
 
     def get(self, request, pk=None):
         if pk:
-            student = get_object_or_404(self.get_queryset(), pk=pk)
-            serializer = self.get_serializer(student)
-            return Response(serializer.data)
-
-        cache_key = f'student_list_all{request.GET.get("student", "all")}'
-        cache_data = cache.get(cache_key)
-        if cache_data:
-            return Response(cache_data, status=status.HTTP_200_OK)
-
-        students = self.get_queryset()
-        paginated_queryset = self.paginate_queryset(students)
-
-        if paginated_queryset is not None:
-            serializer = self.get_serializer(paginated_queryset, many=True)
-            cache.set(cache_key, serializer.data, timeout=60)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(students, many=True)
-        cache.set(cache_key, serializer.data, timeout=60)
-        return Response(serializer.data)
+            return self.retrieve(request, pk)
+        return self.list(request)
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-
-        cache.clear()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def put(self, request, pk):
@@ -398,31 +404,99 @@ class StudentApiView(GenericAPIView):
         serializer = self.get_serializer(student, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-
-        cache.clear()
         return Response(serializer.data)
 
     def delete(self, request, pk):
         student = get_object_or_404(self.get_queryset(), pk=pk)
         student.delete()
-
-        cache.clear()
         return Response({'message': 'Student deleted'}, status=status.HTTP_204_NO_CONTENT)
 
 
+class StudentBulkApiView(APIView):
+    """
+    Enroll many students at once, from a JSON list of students or an uploaded
+    CSV file (field "file") with the same columns. Nothing is created unless
+    every row is valid; otherwise the errors are returned per row.
+    """
+    permission_classes = [IsAuthenticated, IsWithInWorkingHours, WeekdayOnly]
+
+    def post(self, request):
+        if 'file' in request.FILES:
+            try:
+                rows = read_csv(request.FILES['file'])
+            except InvalidFile as exc:
+                return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response({'detail': 'Send a list of students or a CSV file.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        students, errors = enroll_students(rows)
+        if errors:
+            errors = [{'row': number, 'errors': row_errors} for number, row_errors in errors.items()]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {'created': len(students), 'student_codes': [student.student_code for student in students]},
+            status=status.HTTP_201_CREATED,
+        )
+
+
 class CountApiView(APIView):
     permission_classes = [IsAuthenticated, IsWithInWorkingHours, WeekdayOnly]
+    counted_models = COUNTED_MODELS
 
     def get(self, request):
-        return Response({
-            'total_categories': Category.objects.count(),
-            'total_courses': Course.objects.count(),
-            'total_teachers': Teacher.objects.count(),
-            'total_groups': Group.objects.count(),
-            'total_modules': Module.objects.count(),
-            'total_homeworks': Homework.objects.count(),
-            'total_videos': Video.objects.count(),
-            'total_students': Student.objects.count()
-        })
+        entry = get_or_compute(
+            'erp:count',
+            self.get_counts,
+            [get_namespace(model) for model in self.counted_models],
+            limit_to_replica_lag(60),
+        )
+        response = Response(entry.value)
+        if entry.stale:
+            response['X-Cache'] = 'STALE'
+        return response
 
+    def get_counts(self):
+        counts = get_counts(self.counted_models)
+        return {f'total_{model._meta.verbose_name_plural.lower()}': count for model, count in counts.items()}
 
+
+class CacheStatsApiView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        if not hasattr(cache, 'stats'):
+            return Response({'backend': type(cache).__name__})
+        return Response(cache.stats())
+
+
+class DatabaseStatsApiView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_database_stats())
+
+
+class ExportApiView(APIView):
+    permission_classes = [IsAdminUser]
+    # Column names follow the list serializers; foreign keys are exported as ids.
+    exports = {
+        'students': (StudentApiView, [
+            'id', 'first_name', 'last_name', 'gender', 'phone_number', 'image', 'student_code', 'group',
+        ]),
+        'groups': (GroupApiView, ['id', 'name', 'course', 'teacher', 'started_at', 'ended_at', 'status']),
+        'homeworks': (HomeworkApiView, ['id', 'overview', 'file', 'deadline', 'module']),
+    }
+
+    def get(self, request, resource, file_format):
+        if resource not in self.exports or file_format not in CONTENT_TYPES:
+            raise Http404
+        view_class, fields = self.exports[resource]
+        queryset = get_export_queryset(view_class, fields, request)
+        response = StreamingHttpResponse(
+            export_rows(queryset, fields, file_format),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{file_format}"'
+        return response
@@ -0,0 +1,5 @@
+from root.settings import GUNICORN_THREADS, GUNICORN_WORKERS
+
+# Shared with root/settings.py, which sizes the database pool per worker.
+workers = GUNICORN_WORKERS
+threads = GUNICORN_THREADS
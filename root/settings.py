@@ -10,10 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import multiprocessing
 import os
 from pathlib import Path
 
-from decouple import config
+from decouple import Csv, config
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -57,6 +58,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'erp.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     #     DEBUG TOOLBAR
@@ -100,6 +102,48 @@ DATABASES = {
     }
 }
 
+# Database connections. DB_CONNECTION_MODE=persistent (the default) keeps each
+# thread's connection open for DB_CONN_MAX_AGE seconds and checks it before
+# reuse. DB_CONNECTION_MODE=pool uses psycopg 3's pool instead (needs
+# psycopg[pool]), sized so all gunicorn workers stay within DB_MAX_CONNECTIONS.
+GUNICORN_WORKERS = config('GUNICORN_WORKERS', default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+GUNICORN_THREADS = config('GUNICORN_THREADS', default=1, cast=int)
+DB_MAX_CONNECTIONS = config('DB_MAX_CONNECTIONS', default=90, cast=int)
+DB_CONNECTION_MODE = config('DB_CONNECTION_MODE', default='persistent')
+
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if DB_CONNECTION_MODE == 'pool':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': 1,
+            # Request threads plus one for the cache's background revalidation.
+            'max_size': max(1, min(GUNICORN_THREADS + 1, DB_MAX_CONNECTIONS // GUNICORN_WORKERS)),
+            'timeout': config('DB_POOL_TIMEOUT', default=5, cast=float),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=60, cast=int)
+
+# Read replicas of the default database, e.g. DB_REPLICA_HOSTS=replica1,replica2.
+# GET requests read erp models from them (see erp.db_router), unless the
+# client wrote within REPLICA_STICKY_SECONDS or the replica lags more than
+# REPLICA_MAX_LAG seconds.
+DATABASE_REPLICAS = []
+for number, host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'OPTIONS': {**DATABASES['default'].get('OPTIONS', {}), 'connect_timeout': 2},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['erp.db_router.ReplicaRouter']
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+REPLICA_MAX_LAG = config('REPLICA_MAX_LAG', default=5, cast=float)
+REPLICA_CHECK_INTERVAL = config('REPLICA_CHECK_INTERVAL', default=10, cast=float)
+
 
 
 # Password validation
@@ -132,7 +176,6 @@ USE_I18N = True
 
 USE_TZ = True
 
-import os
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
@@ -145,6 +188,16 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'erp/media')
 
+# Largest chunk accepted by the chunked video upload API (erp.uploads); keep it
+# below client_max_body_size in nginx/nginx.conf.
+VIDEO_UPLOAD_CHUNK_SIZE = config('VIDEO_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+
+# With VIDEO_ACCEL_REDIRECT on, the video stream endpoint only checks access and
+# hands the transfer to nginx's internal VIDEO_ACCEL_PREFIX location (see
+# nginx/nginx.conf). Off, as for local runs, Django serves the byte ranges itself.
+VIDEO_ACCEL_REDIRECT = config('VIDEO_ACCEL_REDIRECT', default=False, cast=bool)
+VIDEO_ACCEL_PREFIX = config('VIDEO_ACCEL_PREFIX', default='/protected-media/')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -215,6 +268,41 @@ CACHES = {
     }
 }
 
+# Production profile: Redis with a connection pool and compression of larger payloads
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES['default'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'COMPRESSOR': 'erp.cache_backends.ThresholdZlibCompressor',
+            'COMPRESS_MIN_LENGTH': config('CACHE_COMPRESS_MIN_LENGTH', default=1024, cast=int),
+            'SOCKET_CONNECT_TIMEOUT': 1,
+            'SOCKET_TIMEOUT': 1,
+            'CONNECTION_POOL_KWARGS': {
+                'max_connections': config('REDIS_MAX_CONNECTIONS', default=50, cast=int),
+                'health_check_interval': 30,
+                'retry_on_timeout': True,
+            },
+        },
+    }
+
+# Optional per-worker in-process L1 in front of the shared cache
+if config('CACHE_L1', default=False, cast=bool):
+    CACHES['shared'] = CACHES['default']
+    CACHES['default'] = {
+        'BACKEND': 'erp.cache_backends.TwoTierCache',
+        'LOCATION': 'shared',
+        'TIMEOUT': config('CACHE_L1_TIMEOUT', default=5, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_L1_MAX_ENTRIES', default=1000, cast=int),
+            'REDIS_URL': config('CACHE_L1_REDIS_URL', default=REDIS_URL),
+            'POLL_INTERVAL': config('CACHE_L1_POLL_INTERVAL', default=1, cast=float),
+        },
+    }
+
 INTERNAL_IPS = [
     # ...
     "127.0.0.1",